@@ -0,0 +1,87 @@
+import importlib.util
+import os
+import sys
+
+from logic import *
+
+import puzzle
+
+MASTERMIND = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "src", "mastermind.py"
+)
+
+COLUMNS = [
+    ("Knowledge", 10), ("Query", 16), ("Entailed", 8), ("Symbols", 7),
+    ("Models", 7), ("Evaluate", 8), ("Depth", 5), ("Nodes", 6),
+    ("Time (s)", 9)
+]
+
+
+def main():
+    if sys.argv[1:] not in [[], ["--puzzles"]]:
+        sys.exit("Usage: python kbstats.py [--puzzles]")
+
+    # Puzzles 0-3 from puzzle.py, queried for the same symbols as its main()
+    workloads = [
+        (f"Puzzle {i}", knowledge, [
+            puzzle.AKnight, puzzle.AKnave,
+            puzzle.BKnight, puzzle.BKnave,
+            puzzle.CKnight, puzzle.CKnave
+        ])
+        for i, knowledge in enumerate([
+            puzzle.knowledge0, puzzle.knowledge1,
+            puzzle.knowledge2, puzzle.knowledge3
+        ])
+    ]
+
+    # Mastermind is the slow one, so it can be skipped with --puzzles
+    if len(sys.argv) == 1:
+        mastermind = load_mastermind()
+        workloads.append(
+            ("Mastermind", mastermind.knowledge, mastermind.symbols)
+        )
+
+    print_header()
+    for name, knowledge, symbols in workloads:
+        total = ModelCheckStats()
+        for symbol in symbols:
+            stats = ModelCheckStats()
+            entailed = model_check(knowledge, symbol, stats)
+            print_row(name, symbol, entailed, stats)
+            total.models += stats.models
+            total.evaluations += stats.evaluations
+            total.seconds += stats.seconds
+            total.symbols = stats.symbols
+            total.depth, total.nodes = stats.depth, stats.nodes
+        print_row(name, "(total)", "", total)
+
+
+def load_mastermind():
+    """
+    Import src/mastermind.py without running its main(), reusing this
+    directory's logic module for its knowledge base.
+    """
+    spec = importlib.util.spec_from_file_location("mastermind", MASTERMIND)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def print_header():
+    print(" ".join(f"{title:>{width}}" for title, width in COLUMNS))
+    print(" ".join("-" * width for _, width in COLUMNS))
+
+
+def print_row(name, query, entailed, stats):
+    values = [
+        name, str(query), str(entailed), stats.symbols, stats.models,
+        stats.evaluations, stats.depth, stats.nodes, f"{stats.seconds:.4f}"
+    ]
+    print(" ".join(
+        f"{str(value)[:width]:>{width}}"
+        for value, (_, width) in zip(values, COLUMNS)
+    ))
+
+
+if __name__ == "__main__":
+    main()
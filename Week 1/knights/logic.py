@@ -1,4 +1,5 @@
 import itertools
+import time
 
 
 class Sentence():
@@ -15,6 +16,19 @@ class Sentence():
         """Returns a set of all symbols in the logical sentence."""
         return set()
 
+    def operands(self):
+        """Returns a list of the sentences directly inside this sentence."""
+        return []
+
+    def size(self):
+        """Returns (depth, node count) of the sentence's expression tree."""
+        depth, nodes = 0, 1
+        for operand in self.operands():
+            operand_depth, operand_nodes = operand.size()
+            depth = max(depth, operand_depth)
+            nodes += operand_nodes
+        return depth + 1, nodes
+
     @classmethod
     def validate(cls, sentence):
         if not isinstance(sentence, Sentence):
@@ -92,6 +106,9 @@ class Not(Sentence):
     def symbols(self):
         return self.operand.symbols()
 
+    def operands(self):
+        return [self.operand]
+
 
 class And(Sentence):
     def __init__(self, *conjuncts):
@@ -129,6 +146,9 @@ class And(Sentence):
     def symbols(self):
         return set.union(*[conjunct.symbols() for conjunct in self.conjuncts])
 
+    def operands(self):
+        return list(self.conjuncts)
+
 
 class Or(Sentence):
     def __init__(self, *disjuncts):
@@ -160,6 +180,9 @@ class Or(Sentence):
     def symbols(self):
         return set.union(*[disjunct.symbols() for disjunct in self.disjuncts])
 
+    def operands(self):
+        return list(self.disjuncts)
+
 
 class Implication(Sentence):
     def __init__(self, antecedent, consequent):
@@ -191,6 +214,9 @@ class Implication(Sentence):
     def symbols(self):
         return set.union(self.antecedent.symbols(), self.consequent.symbols())
 
+    def operands(self):
+        return [self.antecedent, self.consequent]
+
 
 class Biconditional(Sentence):
     def __init__(self, left, right):
@@ -224,18 +250,52 @@ class Biconditional(Sentence):
     def symbols(self):
         return set.union(self.left.symbols(), self.right.symbols())
 
+    def operands(self):
+        return [self.left, self.right]
+
+
+class ModelCheckStats():
+    """
+    Diagnostics collected during a single call to model_check.
+    """
 
-def model_check(knowledge, query):
-    """Checks if knowledge base entails query."""
+    def __init__(self):
+        self.symbols = 0
+        self.models = 0
+        self.evaluations = 0
+        self.depth = 0
+        self.nodes = 0
+        self.seconds = 0.0
+
+    def __repr__(self):
+        return (f"ModelCheckStats(symbols={self.symbols}, "
+                f"models={self.models}, evaluations={self.evaluations}, "
+                f"depth={self.depth}, nodes={self.nodes}, "
+                f"seconds={self.seconds:.6f})")
+
+
+def model_check(knowledge, query, stats=None):
+    """
+    Checks if knowledge base entails query.
+
+    If `stats` is a ModelCheckStats, it is filled in with the number of
+    symbols, models enumerated, calls to evaluate, size of the knowledge
+    base and wall time of the check.
+    """
 
     def check_all(knowledge, query, symbols, model):
         """Checks if knowledge base entails query, given a particular model."""
 
         # If model has an assignment for each symbol
         if not symbols:
+            if stats is not None:
+                stats.models += 1
+                stats.evaluations += 1
 
             # If knowledge base is true in model, then query must also be true
             if knowledge.evaluate(model):
+                if stats is not None:
+                    stats.evaluations += 1
                 return query.evaluate(model)
             return True
         else:
@@ -256,8 +316,16 @@ def model_check(knowledge, query):
             return (check_all(knowledge, query, remaining, model_true) and
                     check_all(knowledge, query, remaining, model_false))
 
+    start = time.perf_counter()
+
     # Get all symbols in both knowledge and query
     symbols = set.union(knowledge.symbols(), query.symbols())
 
     # Check that knowledge entails query
-    return check_all(knowledge, query, symbols, dict())
+    result = check_all(knowledge, query, symbols, dict())
+
+    if stats is not None:
+        stats.seconds = time.perf_counter() - start
+        stats.symbols = len(symbols)
+        stats.depth, stats.nodes = knowledge.size()
+    return result
@@ -1,7 +1,51 @@
+from functools import lru_cache
 from hashlib import new
-import itertools
+import math
 import random
 
+# Mine density assumed for unexplored cells when the AI
+# is not told how many mines the board has
+PRIOR_DENSITY = 0.15
+
+# Most assignments to enumerate for one frontier component
+# before falling back on a per-sentence estimate
+MAX_ASSIGNMENTS = 20000
+
+
+@lru_cache(maxsize=None)
+def neighbor_table(height, width):
+    """
+    Returns, for every cell index i * width + j of a board, the bitset
+    of its neighbors and the list of its neighbors as (i, j) cells.
+    """
+    masks = []
+    cells = []
+    for i in range(height):
+        for j in range(width):
+            mask = 0
+            neighbors = []
+            for k in range(max(0, i - 1), min(height, i + 2)):
+                for l in range(max(0, j - 1), min(width, j + 2)):
+                    if (k, l) != (i, j):
+                        mask |= 1 << (k * width + l)
+                        neighbors.append((k, l))
+            masks.append(mask)
+            cells.append(neighbors)
+    return masks, cells
+
+
+def bitset_cells(bits, width):
+    """
+    Returns the (i, j) cells whose bits are set in `bits`.
+    """
+    cells = []
+    while bits:
+        low = bits & -bits
+        index = low.bit_length() - 1
+        cells.append(divmod(index, width))
+        bits ^= low
+    return cells
+
 
 class Minesweeper():
     """
@@ -14,6 +58,10 @@ class Minesweeper():
         self.height = height
         self.width = width
         self.mines = set()
+        self.neighbor_masks, _ = neighbor_table(height, width)
+
+        # Mines as a bitset over cell indices i * width + j
+        self.mine_bits = 0
 
         # Initialize an empty field with no mines
         self.board = []
@@ -30,6 +78,7 @@ class Minesweeper():
             if not self.board[i][j]:
                 self.mines.add((i, j))
                 self.board[i][j] = True
+                self.mine_bits |= 1 << (i * width + j)
 
         # At first, player has found no mines
         self.mines_found = set()
@@ -59,24 +108,8 @@ class Minesweeper():
         within one row and column of a given cell,
         not including the cell itself.
         """
-
-        # Keep count of nearby mines
-        count = 0
-
-        # Loop over all cells within one row and column
-        for i in range(cell[0] - 1, cell[0] + 2):
-            for j in range(cell[1] - 1, cell[1] + 2):
-
-                # Ignore the cell itself
-                if (i, j) == cell:
-                    continue
-
-                # Update count if cell in bounds and is mine
-                if 0 <= i < self.height and 0 <= j < self.width:
-                    if self.board[i][j]:
-                        count += 1
-
-        return count
+        neighbors = self.neighbor_masks[cell[0] * self.width + cell[1]]
+        return (self.mine_bits & neighbors).bit_count()
 
     def won(self):
         """
@@ -146,12 +179,19 @@ class MinesweeperAI():
     Minesweeper game player
     """
 
-    def __init__(self, height=8, width=8):
+    def __init__(self, height=8, width=8, mines=None):
 
         # Set initial height and width
         self.height = height
         self.width = width
 
+        # Total number of mines on the board, if known
+        self.total_mines = mines
+
+        # Neighbors of each cell index i * width + j
+        self.neighbor_masks, self.neighbor_cells = neighbor_table(height, width)
+        self.all_bits = (1 << (height * width)) - 1
+
         # Keep track of which cells have been clicked on
         self.moves_made = set()
 
@@ -159,17 +199,38 @@ class MinesweeperAI():
         self.mines = set()
         self.safes = set()
 
+        # The same sets of cells as bitsets over cell indices
+        self.move_bits = 0
+        self.mine_bits = 0
+        self.safe_bits = 0
+
         # List of sentences about the game known to be true
         self.knowledge = []
 
+        # Index of the live sentences in self.knowledge:
+        # every sentence by its set of cells, and every cell to the
+        # sentences mentioning it
+        self.sentence_keys = dict()
+        self.cell_sentences = dict()
+
+        # Sentences that changed since inference last looked at them
+        self.pending = dict()
+
+        # Mine counts of frontier components from the previous guess
+        self.component_cache = dict()
+
     def mark_mine(self, cell):
         """
         Marks a cell as a mine, and updates all knowledge
         to mark that cell as a mine as well.
         """
         self.mines.add(cell)
-        for sentence in self.knowledge:
-            sentence.mark_mine(cell)
+        self.mine_bits |= 1 << (cell[0] * self.width + cell[1])
+        for sentence in self.cell_sentences.pop(cell, []):
+            if cell in sentence.cells:
+                self.forget(sentence)
+                sentence.mark_mine(cell)
+                self.remember(sentence)
 
     def mark_safe(self, cell):
         """
@@ -177,8 +238,12 @@ class MinesweeperAI():
         to mark that cell as safe as well.
         """
         self.safes.add(cell)
-        for sentence in self.knowledge:
-            sentence.mark_safe(cell)
+        self.safe_bits |= 1 << (cell[0] * self.width + cell[1])
+        for sentence in self.cell_sentences.pop(cell, []):
+            if cell in sentence.cells:
+                self.forget(sentence)
+                sentence.mark_safe(cell)
+                self.remember(sentence)
 
     def add_knowledge(self, cell, count):
         """
@@ -195,77 +260,126 @@ class MinesweeperAI():
             5) add any new sentences to the AI's knowledge base
                if they can be inferred from existing knowledge
         """
-        #implemented step by step:
         #step 1: mark cell as move that is made:
         self.moves_made.add(cell)
+        self.move_bits |= 1 << (cell[0] * self.width + cell[1])
 
         #step 2: mark the cell as safe:
-        self.safes.add(cell)
+        self.mark_safe(cell)
 
-        #step 3: add a new sentence to the AI's knowledge base based on the value of cells count:
-        #not the most efficient, but should work :)
-        newSentence = set()
-        if(cell[0]-1 >= 0 and cell[1]-1 >= 0):
-            newSentence.add((cell[0]-1,cell[1]-1))
-        if(cell[0]-1 >= 0 and cell[1]+1 <= (self.width-1)):
-            newSentence.add((cell[0]-1, cell[1]+1))
-        if(cell[0]+1 <= self.height-1 and cell[1]-1 >= 0):
-            newSentence.add((cell[0]+1, cell[1]-1))
-        if(cell[0]+1 <= self.height-1 and cell[1]+1 < self.width):
-            newSentence.add((cell[0]+1, cell[1]+1))
-        if(cell[0]+1 < self.height):
-            newSentence.add((cell[0]+1, cell[1]))
-        if(cell[0]-1 >= 0):
-            newSentence.add((cell[0]-1, cell[1]))
-        if(cell[1]+1 < self.width):
-            newSentence.add((cell[0], cell[1]+1))
-        if(cell[1]-1 >= 0):
-            newSentence.add((cell[0], cell[1]-1))
-        #now we need to remove all the mines and safes that we already know
-        #we cant update as we iterate so here's a seperate set 
-        toRemove = set()
-        countRemove = 0
-        for cel in newSentence:
-            if(cel in self.mines):
-                toRemove.add(cel)
-                #newSentence.remove(cel)
-                countRemove += 1
-            elif(cel in self.safes):
-                toRemove.add(cel)
-                #newSentence.remove(cel)
-        newSentence = newSentence - toRemove
-        #add sentence to AI KB
-        updateSentence = Sentence(newSentence, count - countRemove)
-        self.knowledge.append(updateSentence)
-
-        #step 4: mark additional cells as safe or as mines based on KB
-        #again, can't update while iterating, so here's seperate sets
-        areMines = set()
-        areSafes = set()
-        for sentence in self.knowledge:
-            for mineCell in sentence.known_mines():
-                areMines.add(mineCell)
-            for safeCell in sentence.known_safes():
-                areSafes.add(safeCell)
-
-        for mine in areMines:
-            self.mark_mine(mine)
-        for safe in areSafes:
-            self.mark_safe(safe)
-
-        #step 5: add new sentences to AI KB from inferred/existing knowledge(subset method)
-        #loop over sentences in KB and compare to current sentence using subset method
-        for sentence in self.knowledge:
-            #avoid empty sets
-            if sentence.cells and updateSentence.cells != updateSentence.cells:
-                #if sentence subset of updated
-                if(sentence.cells.issubset(updateSentence.cells)):
-                    self.knowledge.append(Sentence(updateSentence.cells - sentence.cells, updateSentence.count - sentence.count))
-                #if updated is subset of sentence
-                elif(updateSentence.cells.issubset(sentence.cells)):
-                    self.knowledge.append(Sentence(sentence.cells - updateSentence.cells, sentence.count - updateSentence.count))
+        #step 3: add a sentence about the neighbors of cell
+        index = cell[0] * self.width + cell[1]
+        if self.neighbor_masks[index] & ~(self.mine_bits | self.safe_bits):
+            self.add_sentence(self.neighbor_cells[index], count)
 
+        #steps 4 and 5: infer mines, safes and new sentences until nothing changes
+        self.infer()
 
+    def add_sentence(self, cells, count):
+        """
+        Adds the sentence `cells` = `count` to the knowledge base,
+        leaving out cells already known to be mines or safe.
+        Empty sentences and sentences already known are dropped.
+        """
+        unknown = set()
+        for cell in cells:
+            if cell in self.mines:
+                count -= 1
+            elif cell not in self.safes:
+                unknown.add(cell)
+        sentence = Sentence(unknown, count)
+        if self.remember(sentence):
+            self.knowledge.append(sentence)
+            for cell in sentence.cells:
+                self.cell_sentences.setdefault(cell, []).append(sentence)
+
+    def remember(self, sentence):
+        """
+        Indexes a sentence by its cells and queues it for inference.
+        Returns False, emptying the sentence, if it has no cells left
+        or the same cells are already covered by another sentence.
+        """
+        key = frozenset(sentence.cells)
+        if not key or key in self.sentence_keys:
+            sentence.cells = set()
+            return False
+        self.sentence_keys[key] = sentence
+        self.pending[id(sentence)] = sentence
+        return True
+
+    def forget(self, sentence):
+        """
+        Removes a sentence from the index of sentences by cells.
+        """
+        key = frozenset(sentence.cells)
+        if self.sentence_keys.get(key) is sentence:
+            del self.sentence_keys[key]
+
+    def infer(self):
+        """
+        Runs inference over the pending sentences until no new mines,
+        safes or sentences can be concluded, then drops empty sentences.
+
+        A sentence whose count is 0 or equal to its size marks its cells.
+        Otherwise it is compared with every sentence sharing a cell:
+        if one is a subset of the other the difference is a new sentence,
+        and if the mines one sentence forces into the overlap already
+        fill the other, the remaining cells are mines on one side and
+        safe on the other.
+        """
+        while self.pending:
+            _, sentence = self.pending.popitem()
+            if not sentence.cells:
+                continue
+
+            mines = set(sentence.known_mines())
+            safes = set(sentence.known_safes())
+            inferred = []
+            if not mines and not safes:
+                for other in self.overlapping(sentence):
+                    only_self = sentence.cells - other.cells
+                    only_other = other.cells - sentence.cells
+                    difference = sentence.count - other.count
+                    if difference == len(only_self):
+                        mines |= only_self
+                        safes |= only_other
+                    elif -difference == len(only_other):
+                        mines |= only_other
+                        safes |= only_self
+                    elif not only_other:
+                        inferred.append((only_self, difference))
+                    elif not only_self:
+                        inferred.append((only_other, -difference))
+
+            for cell in mines:
+                self.mark_mine(cell)
+            for cell in safes:
+                self.mark_safe(cell)
+            for cells, count in inferred:
+                self.add_sentence(cells, count)
+
+        # Garbage collect empty sentences once they outnumber live ones
+        if len(self.knowledge) > 2 * len(self.sentence_keys):
+            self.knowledge = [
+                sentence for sentence in self.knowledge if sentence.cells
+            ]
+
+    def overlapping(self, sentence):
+        """
+        Returns the live sentences, other than `sentence`,
+        sharing at least one cell with `sentence`.
+        """
+        others = dict()
+        for cell in sentence.cells:
+            live = [
+                other for other in self.cell_sentences.get(cell, [])
+                if other.cells
+            ]
+            self.cell_sentences[cell] = live
+            for other in live:
+                if other is not sentence:
+                    others[id(other)] = other
+        return list(others.values())
 
     def make_safe_move(self):
         """
@@ -276,41 +390,223 @@ class MinesweeperAI():
         This function may use the knowledge in self.mines, self.safes
         and self.moves_made, but should not modify any of those values.
         """
-        for move in self.safes:
-            if move not in self.moves_made:
-                return move
-        
-        return None
+        moves = self.safe_bits & ~self.move_bits
+        if not moves:
+            return None
+        index = (moves & -moves).bit_length() - 1
+        return divmod(index, self.width)
 
 
     def make_random_move(self):
         """
         Returns a move to make on the Minesweeper board.
-        Should choose randomly among cells that:
+        Chooses among cells that:
             1) have not already been chosen, and
             2) are not known to be mines
+        the cell least likely to be a mine, breaking ties at random.
         """
-        #'random' move!
-        #all possible moves:
-        possibleMoves = set(itertools.product(range(self.height), range(self.width)))
-
-        #all moves we can take
-        movesReasonable = list(possibleMoves - self.mines - self.moves_made)
-
-        #return random choice out of movesReasonable
-        if(len(movesReasonable) == 0):
+        probabilities = self.mine_probabilities()
+        if not probabilities:
             return None
-        else:
-            return random.choice(movesReasonable)
-
-        #raise NotImplementedError
-
-
-
-
-
-
-
+        lowest = min(probabilities.values())
+        return random.choice([
+            cell for cell, p in probabilities.items() if p == lowest
+        ])
 
+    def mine_probabilities(self):
+        """
+        Returns a dictionary mapping every cell that has not been chosen
+        and is not known to be a mine to the probability it is a mine.
+
+        Cells in the knowledge base (the frontier) are split into
+        components that share no sentence. The consistent mine
+        assignments of each component are counted by the number of
+        mines they use, and components are combined with the cells
+        no sentence mentions (the interior) by counting the ways to
+        place the remaining mines there.
+        """
+        cells = bitset_cells(
+            self.all_bits & ~(self.move_bits | self.mine_bits), self.width
+        )
+        probabilities = {
+            cell: 0.0 for cell in bitset_cells(
+                self.safe_bits & ~(self.move_bits | self.mine_bits),
+                self.width
+            )
+        }
+
+        # Count the assignments of each component, reusing unchanged ones
+        cache = dict()
+        counts = []
+        for component in self.components():
+            key = frozenset(
+                (frozenset(sentence.cells), sentence.count)
+                for sentence in component
+            )
+            if key not in self.component_cache:
+                self.component_cache[key] = count_assignments(component)
+            cache[key] = self.component_cache[key]
+
+            # Components too large to enumerate get a local estimate
+            if cache[key] is None:
+                for sentence in component:
+                    for cell in sentence.cells:
+                        probabilities[cell] = max(
+                            probabilities.get(cell, 0),
+                            sentence.count / len(sentence.cells)
+                        )
+            else:
+                counts.append(cache[key])
+        self.component_cache = cache
+
+        frontier = set()
+        for by_mines, by_cell in counts:
+            frontier.update(by_cell)
+        interior = [
+            cell for cell in cells
+            if cell not in probabilities and cell not in frontier
+        ]
+
+        # Weight of every way of placing k mines in the frontier,
+        # and of those, the mines expected in the interior
+        total = convolve([by_mines for by_mines, by_cell in counts])
+        weights = dict()
+        interior_mines = dict()
+        for k in range(max(total) + 1):
+            if self.total_mines is None:
+                weights[k] = (PRIOR_DENSITY / (1 - PRIOR_DENSITY)) ** k
+                interior_mines[k] = PRIOR_DENSITY * len(interior)
+            else:
+                left = self.total_mines - len(self.mines) - k
+                weights[k] = math.comb(len(interior), left) if left >= 0 else 0
+                interior_mines[k] = left
+        normalizer = sum(total[k] * weights[k] for k in total)
+        if not normalizer:
+            # Knowledge is inconsistent with the mine count; guess blindly
+            return {cell: 0.0 if cell in self.safes else 0.5 for cell in cells}
+
+        for i, (by_mines, by_cell) in enumerate(counts):
+            others = convolve([
+                counts[j][0] for j in range(len(counts)) if j != i
+            ])
+            for cell, cell_by_mines in by_cell.items():
+                weight = 0
+                for k, count in cell_by_mines.items():
+                    for k_other, count_other in others.items():
+                        weight += count * count_other * weights[k + k_other]
+                probabilities[cell] = weight / normalizer
+
+        if interior:
+            expected = sum(
+                total[k] * weights[k] * interior_mines[k] for k in total
+            ) / normalizer
+            for cell in interior:
+                probabilities[cell] = expected / len(interior)
+
+        return probabilities
+
+    def components(self):
+        """
+        Returns the live sentences of the knowledge base grouped into
+        lists of sentences connected through shared cells.
+        """
+        parent = dict()
+
+        def find(cell):
+            while parent[cell] != cell:
+                parent[cell] = parent[parent[cell]]
+                cell = parent[cell]
+            return cell
+
+        sentences = list(self.sentence_keys.values())
+        for sentence in sentences:
+            cells = list(sentence.cells)
+            for cell in cells:
+                parent.setdefault(cell, cell)
+            for cell in cells[1:]:
+                parent[find(cell)] = find(cells[0])
+
+        groups = dict()
+        for sentence in sentences:
+            root = find(next(iter(sentence.cells)))
+            groups.setdefault(root, []).append(sentence)
+        return list(groups.values())
+
+
+def count_assignments(sentences):
+    """
+    Counts the mine assignments to the cells of `sentences` that satisfy
+    every sentence. Returns a pair of dictionaries: the number of
+    assignments by number of mines used, and for each cell the number of
+    assignments in which it is a mine, again by number of mines used.
+    Returns None if there are more than MAX_ASSIGNMENTS assignments.
+    """
+    # Order cells so that neighbors in the frontier are assigned together
+    order = []
+    seen = set()
+    for sentence in sentences:
+        for cell in sorted(sentence.cells):
+            if cell not in seen:
+                seen.add(cell)
+                order.append(cell)
+    position = {cell: i for i, cell in enumerate(order)}
+
+    # For each sentence, mines still needed and cells still unassigned
+    needed = [sentence.count for sentence in sentences]
+    unassigned = [len(sentence.cells) for sentence in sentences]
+    involving = [[] for cell in order]
+    for index, sentence in enumerate(sentences):
+        for cell in sentence.cells:
+            involving[position[cell]].append(index)
+
+    by_mines = dict()
+    by_cell = {cell: dict() for cell in order}
+    assignment = [False] * len(order)
+    leaves = 0
+
+    def assign(i, mines):
+        nonlocal leaves
+        if i == len(order):
+            leaves += 1
+            if leaves > MAX_ASSIGNMENTS:
+                return False
+            by_mines[mines] = by_mines.get(mines, 0) + 1
+            for cell, mine in zip(order, assignment):
+                if mine:
+                    by_cell[cell][mines] = by_cell[cell].get(mines, 0) + 1
+            return True
+        for mine in (False, True):
+            consistent = True
+            for index in involving[i]:
+                needed[index] -= mine
+                unassigned[index] -= 1
+                if not 0 <= needed[index] <= unassigned[index]:
+                    consistent = False
+            if consistent:
+                assignment[i] = mine
+                if not assign(i + 1, mines + mine):
+                    return False
+            for index in involving[i]:
+                needed[index] += mine
+                unassigned[index] += 1
+        return True
+
+    if not assign(0, 0):
+        return None
+    return by_mines, by_cell
 
 
+def convolve(distributions):
+    """
+    Combines dictionaries mapping a number of mines to a count of
+    assignments into the counts for the total number of mines.
+    """
+    total = {0: 1}
+    for distribution in distributions:
+        combined = dict()
+        for k, count in total.items():
+            for k_other, count_other in distribution.items():
+                combined[k + k_other] = (combined.get(k + k_other, 0) +
+                                         count * count_other)
+        total = combined
+    return total
@@ -0,0 +1,134 @@
+import multiprocessing
+import random
+import sys
+import time
+
+from minesweeper import Minesweeper, MinesweeperAI
+
+# Board configurations to benchmark: (name, height, width, mines)
+BOARDS = [
+    ("beginner", 8, 8, 8),
+    ("sparse", 9, 9, 10),
+    ("intermediate", 16, 16, 40),
+    ("expert", 16, 30, 99)
+]
+
+GAMES = 100
+
+# Moves at which the size of the knowledge base is reported
+CHECKPOINTS = [1, 10, 25, 50, 100, 200]
+
+
+def main():
+    if len(sys.argv) > 3:
+        sys.exit("Usage: python simulate.py [games] [workers]")
+    games = int(sys.argv[1]) if len(sys.argv) > 1 else GAMES
+    workers = (int(sys.argv[2]) if len(sys.argv) > 2
+               else multiprocessing.cpu_count())
+
+    # Every game gets its own seed so results are reproducible
+    tasks = [
+        (height, width, mines, seed)
+        for name, height, width, mines in BOARDS
+        for seed in range(games)
+    ]
+    start = time.perf_counter()
+    with multiprocessing.Pool(workers) as pool:
+        results = pool.map(play, tasks, chunksize=max(1, games // workers))
+    elapsed = time.perf_counter() - start
+
+    for i, (name, height, width, mines) in enumerate(BOARDS):
+        report(f"{name} {height}x{width}, {mines} mines",
+               results[i * games:(i + 1) * games])
+    print(f"{len(tasks)} games in {elapsed:.2f}s using {workers} workers")
+
+
+def play(task):
+    """
+    Play one game of Minesweeper with the AI making every move.
+    Returns a dictionary with whether the AI won, the number of moves
+    made, the seconds taken by each move, and the number of sentences
+    in the AI's knowledge base after each move.
+    """
+    height, width, mines, seed = task
+    random.seed(seed)
+    game = Minesweeper(height=height, width=width, mines=mines)
+    ai = MinesweeperAI(height=height, width=width, mines=mines)
+
+    latencies = []
+    knowledge = []
+    won = False
+    while True:
+
+        # The game is won once every safe cell is revealed, whether or not
+        # the AI has worked out where each remaining mine is
+        if len(ai.moves_made) == height * width - mines:
+            won = True
+            break
+        start = time.perf_counter()
+        move = ai.make_safe_move()
+        if move is None:
+            move = ai.make_random_move()
+
+        # No moves left means every mine has been found
+        if move is None:
+            won = ai.mines == game.mines
+            break
+        if game.is_mine(move):
+            break
+        ai.add_knowledge(move, game.nearby_mines(move))
+        latencies.append(time.perf_counter() - start)
+        knowledge.append(len(ai.knowledge))
+
+    return {
+        "won": won,
+        "moves": len(latencies),
+        "latencies": latencies,
+        "knowledge": knowledge
+    }
+
+
+def report(title, results):
+    """
+    Print win rate, throughput, move latency percentiles
+    and knowledge base size for a list of results from play.
+    """
+    latencies = sorted(
+        latency for result in results for latency in result["latencies"]
+    )
+    wins = sum(result["won"] for result in results)
+    moves = len(latencies)
+    seconds = sum(latencies)
+
+    print(title)
+    print(f"  Win rate: {wins / len(results):.2%} "
+          f"({wins} of {len(results)})")
+    print(f"  Moves: {moves}, {moves / seconds if seconds else 0:.0f}/s")
+    print("  Move latency (ms): " + ", ".join(
+        f"p{p} {percentile(latencies, p) * 1000:.3f}"
+        for p in [50, 90, 99, 100]
+    ))
+
+    # Average knowledge base size over the games that reached each move
+    sizes = []
+    for checkpoint in CHECKPOINTS:
+        reached = [
+            result["knowledge"][checkpoint - 1] for result in results
+            if len(result["knowledge"]) >= checkpoint
+        ]
+        if reached:
+            sizes.append(f"{checkpoint}: {sum(reached) / len(reached):.1f}")
+    print("  Knowledge size by move: " + ", ".join(sizes))
+
+
+def percentile(values, p):
+    """
+    Return the p-th percentile of a sorted list, or 0 if it is empty.
+    """
+    if not values:
+        return 0
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+if __name__ == "__main__":
+    main()
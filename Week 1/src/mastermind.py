@@ -51,6 +51,12 @@ knowledge.add(And(
     Not(Symbol("yellow3"))
 ))
 
-for symbol in symbols:
-    if model_check(knowledge, symbol):
-        print(symbol)
+
+def main():
+    for symbol in symbols:
+        if model_check(knowledge, symbol):
+            print(symbol)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import csv
+import json
+import multiprocessing
+import os
+import sys
+
+from heredity import METHODS, compute, load_data
+
+# Columns of the CSV output, one row per person
+FIELDS = [
+    "family", "person",
+    "gene_2", "gene_1", "gene_0",
+    "trait_true", "trait_false"
+]
+
+
+def main():
+
+    # Check for proper usage
+    if (len(sys.argv) not in [3, 4]
+            or os.path.splitext(sys.argv[2])[1] not in [".jsonl", ".csv"]
+            or not set(sys.argv[3:]) <= set(METHODS)):
+        sys.exit("Usage: python batch.py directory output.jsonl|output.csv "
+                 "[exact|enumerate|likelihood|gibbs]")
+    directory, output = sys.argv[1], sys.argv[2]
+    method = sys.argv[3] if len(sys.argv) == 4 else "exact"
+
+    filenames = sorted(
+        os.path.join(directory, filename)
+        for filename in os.listdir(directory)
+        if filename.endswith(".csv")
+    )
+    tasks = [(filename, method) for filename in filenames]
+
+    # Families are independent, so one pool handles them all; results
+    # are written in input order as they arrive
+    workers = multiprocessing.cpu_count()
+    with multiprocessing.Pool(workers) as pool, open(output, "w") as f:
+        write = (write_jsonl if output.endswith(".jsonl") else write_csv)(f)
+        for family, probabilities in pool.imap(
+            process, tasks, chunksize=max(1, len(tasks) // (workers * 4))
+        ):
+            write(family, probabilities)
+    print(f"Processed {len(tasks)} families into {output}")
+
+
+def process(task):
+    """
+    Load one family CSV and compute everyone's gene and trait
+    distributions. Return (family name, probabilities).
+    """
+    filename, method = task
+    probabilities, _ = compute(load_data(filename), method)
+    return os.path.splitext(os.path.basename(filename))[0], probabilities
+
+
+def write_jsonl(f):
+    """
+    Return a function writing one family per line of JSON to file `f`.
+    """
+    def write(family, probabilities):
+        f.write(json.dumps({
+            "family": family,
+            "probabilities": probabilities
+        }) + "\n")
+    return write
+
+
+def write_csv(f):
+    """
+    Return a function writing one row per person to CSV file `f`.
+    """
+    writer = csv.writer(f)
+    writer.writerow(FIELDS)
+
+    def write(family, probabilities):
+        for person, distributions in probabilities.items():
+            writer.writerow([
+                family, person,
+                *(distributions["gene"][n] for n in (2, 1, 0)),
+                *(distributions["trait"][t] for t in (True, False))
+            ])
+    return write
+
+
+if __name__ == "__main__":
+    main()
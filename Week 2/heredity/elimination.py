@@ -0,0 +1,266 @@
+import heapq
+import itertools
+
+# Every person has 0, 1 or 2 copies of the gene
+GENES = (0, 1, 2)
+
+
+class Factor():
+    """
+    A non-negative function of the gene counts of some people.
+    `scope` is a tuple of names and `table` maps every tuple of
+    gene counts (in scope order) to a value.
+    """
+
+    def __init__(self, scope, table):
+        self.scope = tuple(scope)
+        self.table = table
+
+    def __mul__(self, other):
+        if not other.scope:
+            return Factor(self.scope, {
+                genes: value * other.table[()]
+                for genes, value in self.table.items()
+            })
+        if not self.scope:
+            return other * self
+        scope = self.scope + tuple(
+            name for name in other.scope if name not in self.scope
+        )
+        mine = len(self.scope)
+        theirs = [scope.index(name) for name in other.scope]
+        table = dict()
+        for genes in itertools.product(GENES, repeat=len(scope)):
+            table[genes] = (
+                self.table[genes[:mine]] *
+                other.table[tuple([genes[i] for i in theirs])]
+            )
+        return Factor(scope, table)
+
+    def marginalize(self, names):
+        """
+        Return the factor over `names` obtained by summing out
+        every other person in this factor's scope.
+        """
+        scope = tuple(name for name in self.scope if name in names)
+        keep = [self.scope.index(name) for name in scope]
+        table = dict.fromkeys(itertools.product(GENES, repeat=len(scope)), 0)
+        for genes, value in self.table.items():
+            table[tuple([genes[i] for i in keep])] += value
+        return Factor(scope, table)
+
+
+def inheritance_table(mutation):
+    """
+    Return a 3x3x3 nested list where [mother][father][child] is the
+    probability that a child of parents with `mother` and `father`
+    copies of the gene has `child` copies, given the mutation rate.
+    """
+    # Probability that a parent with n copies passes one on
+    passes = [mutation, 0.5, 1 - mutation]
+    table = []
+    for mother in GENES:
+        table.append([])
+        for father in GENES:
+            m, f = passes[mother], passes[father]
+            table[mother].append([
+                (1 - m) * (1 - f),
+                m * (1 - f) + (1 - m) * f,
+                m * f
+            ])
+    return table
+
+
+def parents_first(people):
+    """
+    Return the names in `people` ordered so that parents come
+    before their children. Raise ValueError if some parent is missing
+    from `people` or someone is their own ancestor.
+    """
+    order = []
+    placed = set()
+    while len(order) < len(people):
+        placing = len(order)
+        for person in people:
+            if person not in placed and all(
+                parent is None or parent in placed
+                for parent in (people[person]["mother"],
+                               people[person]["father"])
+            ):
+                order.append(person)
+                placed.add(person)
+
+        # A pass that places nobody will never place anyone
+        if len(order) == placing:
+            unresolved = [person for person in people if person not in placed]
+            raise ValueError(
+                "parents missing or in a cycle for " + ", ".join(unresolved)
+            )
+    return order
+
+
+def person_factor(people, person, probs):
+    """
+    Return the factor for `person`: the probability of their gene count
+    given their parents' (or unconditionally, for a founder), times the
+    probability of their trait if it is known.
+    """
+    mother = people[person]["mother"]
+    father = people[person]["father"]
+    trait = people[person]["trait"]
+
+    def evidence(genes):
+        return 1 if trait is None else probs["trait"][genes][trait]
+
+    if mother is None:
+        return Factor((person,), {
+            (genes,): probs["gene"][genes] * evidence(genes) for genes in GENES
+        })
+
+    inheritance = inheritance_table(probs["mutation"])
+    table = dict()
+    for genes, mother_genes, father_genes in itertools.product(GENES, repeat=3):
+        table[(genes, mother_genes, father_genes)] = (
+            inheritance[mother_genes][father_genes][genes] * evidence(genes)
+        )
+    return Factor((person, mother, father), table)
+
+
+def elimination_order(people):
+    """
+    Return an order in which to eliminate everyone in `people`,
+    greedily picking the person whose elimination adds the fewest edges
+    between their remaining neighbors (min-fill).
+    """
+    # Moral graph: a child is linked to both parents, and parents to each other
+    neighbors = {person: set() for person in people}
+    for person in people:
+        family = {person, people[person]["mother"], people[person]["father"]}
+        family.discard(None)
+        for name in family:
+            neighbors[name] |= family - {name}
+
+    def fill(person):
+        adjacent = list(neighbors[person])
+        return sum(
+            1 for a, b in itertools.combinations(adjacent, 2)
+            if b not in neighbors[a]
+        )
+
+    # Heap of (fill, degree, person); entries go stale as the graph changes
+    fills = {person: fill(person) for person in people}
+    heap = [
+        (fills[person], len(neighbors[person]), i, person)
+        for i, person in enumerate(people)
+    ]
+    heapq.heapify(heap)
+    counter = len(heap)
+    order = []
+    while fills:
+        count, degree, _, person = heapq.heappop(heap)
+        if (person not in fills or fills[person] != count
+                or len(neighbors[person]) != degree):
+            continue
+        order.append(person)
+        del fills[person]
+
+        # Connect the remaining neighbors, then update affected fill counts
+        adjacent = neighbors.pop(person)
+        for name in adjacent:
+            neighbors[name].discard(person)
+            neighbors[name] |= adjacent - {name}
+        affected = set(adjacent)
+        for name in adjacent:
+            affected |= neighbors[name]
+        for name in affected:
+            fills[name] = fill(name)
+            heapq.heappush(
+                heap, (fills[name], len(neighbors[name]), counter, name)
+            )
+            counter += 1
+    return order
+
+
+def marginals(people, probs):
+    """
+    Return gene and trait distributions for every person in `people`,
+    conditioned on the known traits, in the same format as the
+    `probabilities` dictionary of heredity.py.
+
+    Runs variable elimination over the pedigree and keeps the product
+    formed when eliminating each person as a clique. A second pass sends
+    messages back down the resulting clique tree, so every person's
+    marginal comes from one sweep instead of one elimination per person.
+    """
+    order = elimination_order(people)
+    position = {person: i for i, person in enumerate(order)}
+
+    # Each factor is assigned to the clique of its first eliminated person
+    potentials = [Factor((), {(): 1}) for person in order]
+    for person in people:
+        factor = person_factor(people, person, probs)
+        first = min(factor.scope, key=position.get)
+        potentials[position[first]] = potentials[position[first]] * factor
+
+    # Upward pass: eliminate people in order, recording which clique
+    # receives the message produced by eliminating each person
+    parent = [None] * len(order)
+    upward = [None] * len(order)
+    inbox = [[] for person in order]
+    for i, person in enumerate(order):
+        clique = potentials[i]
+        for child in inbox[i]:
+            clique = clique * upward[child]
+        message = clique.marginalize(set(clique.scope) - {person})
+        upward[i] = message
+        if message.scope:
+            parent[i] = min(position[name] for name in message.scope)
+            inbox[parent[i]].append(i)
+
+    # Downward pass: from the roots, send each clique's belief to its
+    # children, excluding what the child itself sent up. Products of the
+    # messages before and after each child avoid multiplying k^2 factors.
+    downward = [None] * len(order)
+    probabilities = dict()
+    for i in reversed(range(len(order))):
+        base = potentials[i]
+        if downward[i] is not None:
+            base = base * downward[i]
+        children = inbox[i]
+        before = [base]
+        for child in children:
+            before.append(before[-1] * upward[child])
+        belief = before[-1]
+        after = None
+        for k in reversed(range(len(children))):
+            rest = before[k] if after is None else before[k] * after
+            downward[children[k]] = rest.marginalize(
+                set(upward[children[k]].scope)
+            )
+            after = (upward[children[k]] if after is None
+                     else upward[children[k]] * after)
+
+        # The person eliminated at this clique is always in its scope
+        person = order[i]
+        gene = belief.marginalize({person})
+        total = sum(gene.table.values())
+        distribution = {genes: gene.table[(genes,)] / total for genes in GENES}
+        probabilities[person] = {
+            "gene": {genes: distribution[genes] for genes in (2, 1, 0)},
+            "trait": trait_distribution(
+                distribution, people[person]["trait"], probs
+            )
+        }
+
+    return {person: probabilities[person] for person in people}
+
+
+def trait_distribution(genes, trait, probs):
+    """
+    Return the distribution of a person's trait given the distribution
+    of their gene count and their trait, if known.
+    """
+    if trait is not None:
+        return {True: float(trait), False: float(not trait)}
+    have = sum(genes[n] * probs["trait"][n][True] for n in GENES)
+    return {True: have, False: 1 - have}
@@ -1,7 +1,13 @@
 import csv
 import itertools
+import multiprocessing
 import sys
 
+import numpy as np
+
+import elimination
+import sampling
+
 PROBS = {
 
     # Unconditional probabilities for having gene
@@ -36,13 +42,82 @@ PROBS = {
     "mutation": 0.01
 }
 
+# INHERITANCE[mother][father][child]: probability of the child's gene count
+# given the parents' gene counts
+INHERITANCE = elimination.inheritance_table(PROBS["mutation"])
+
+
+# Ways of computing everyone's gene and trait distributions
+METHODS = ["exact", "enumerate", "likelihood", "gibbs"]
+
+# Default number of samples for the approximate methods
+SAMPLES = 10000
+
+# Assignments that enumeration passes to joint_probabilities at once
+BATCH = 4096
+
 
 def main():
 
     # Check for proper usage
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python heredity.py data.csv")
+    if (len(sys.argv) not in [2, 3, 4, 5]
+            or not set(sys.argv[2:3]) <= set(METHODS)
+            or not all(arg.isdigit() for arg in sys.argv[3:])
+            or (len(sys.argv) > 3 and int(sys.argv[3]) < 1)):
+        sys.exit("Usage: python heredity.py data.csv "
+                 "[exact|enumerate|likelihood|gibbs] [samples] [seed]")
     people = load_data(sys.argv[1])
+    method = sys.argv[2] if len(sys.argv) > 2 else "exact"
+    samples = int(sys.argv[3]) if len(sys.argv) > 3 else SAMPLES
+    seed = int(sys.argv[4]) if len(sys.argv) > 4 else None
+
+    probabilities, diagnostics = compute(
+        people, method, samples, seed, workers=multiprocessing.cpu_count()
+    )
+
+    # Print results
+    for person in people:
+        print(f"{person}:")
+        for field in probabilities[person]:
+            print(f"  {field.capitalize()}:")
+            for value in probabilities[person][field]:
+                p = probabilities[person][field][value]
+                print(f"    {value}: {p:.4f}")
+    if diagnostics is not None:
+        print("Diagnostics:")
+        for name, value in diagnostics.items():
+            print(f"  {name}: {value:.4f}" if isinstance(value, float)
+                  else f"  {name}: {value}")
+
+
+def compute(people, method="exact", samples=SAMPLES, seed=None, workers=1):
+    """
+    Compute gene and trait distributions for everyone in `people` with
+    one of METHODS. Return (probabilities, diagnostics), where diagnostics
+    is None for the exact methods.
+    """
+    # Variable elimination scales to large families; enumeration is
+    # exponential in family size but a useful reference. Sampling gives
+    # approximate answers with diagnostics on how far to trust them.
+    if method == "exact":
+        return elimination.marginals(people, PROBS), None
+    elif method == "enumerate":
+        return enumerate_probabilities(people), None
+    elif method == "likelihood":
+        return sampling.likelihood_weighting(
+            people, PROBS, samples, seed, workers=workers
+        )
+    elif method == "gibbs":
+        return sampling.gibbs(people, PROBS, samples, seed, workers=workers)
+    raise ValueError(f"unknown method {method}")
+
+
+def enumerate_probabilities(people):
+    """
+    Compute gene and trait distributions for everyone in `people`
+    by summing the joint probability of every assignment of genes
+    and traits consistent with the known traits.
+    """
 
     # Keep track of gene and trait probabilities for each person
     probabilities = {
@@ -60,38 +135,28 @@ def main():
         for person in people
     }
 
-    # Loop over all sets of people who might have the trait
-    names = set(people)
-    for have_trait in powerset(names):
-
-        # Check if current set of people violates known information
-        fails_evidence = any(
-            (people[person]["trait"] is not None and
-             people[person]["trait"] != (person in have_trait))
-            for person in names
-        )
-        if fails_evidence:
-            continue
-
-        # Loop over all sets of people who might have the gene
-        for one_gene in powerset(names):
-            for two_genes in powerset(names - one_gene):
-
-                # Update probabilities with new joint probability
-                p = joint_probability(people, one_gene, two_genes, have_trait)
-                update(probabilities, one_gene, two_genes, have_trait, p)
+    # Unrelated families are independent, so enumerate each on its own,
+    # scoring its assignments a batch at a time
+    for family in families(people):
+        rows = assignments(family)
+        while True:
+            batch = list(itertools.islice(rows, BATCH))
+            if not batch:
+                break
+            genes = np.array([genes for genes, _ in batch])
+            traits = np.array([traits for _, traits in batch])
+            p = joint_probabilities(family, genes, traits)
+            for i, person in enumerate(family):
+                totals = np.bincount(genes[:, i], p, minlength=3)
+                for n in (0, 1, 2):
+                    probabilities[person]["gene"][n] += float(totals[n])
+                have = float(p[traits[:, i]].sum())
+                probabilities[person]["trait"][True] += have
+                probabilities[person]["trait"][False] += float(p.sum()) - have
 
     # Ensure probabilities sum to 1
     normalize(probabilities)
-
-    # Print results
-    for person in people:
-        print(f"{person}:")
-        for field in probabilities[person]:
-            print(f"  {field.capitalize()}:")
-            for value in probabilities[person][field]:
-                p = probabilities[person][field][value]
-                print(f"    {value}: {p:.4f}")
+    return probabilities
 
 
 def load_data(filename):
@@ -120,12 +185,86 @@ def powerset(s):
     """
     Return a list of all possible subsets of set s.
     """
+    return list(subsets(s))
+
+
+def subsets(s):
+    """
+    Lazily generate all possible subsets of set s.
+    """
     s = list(s)
-    return [
-        set(s) for s in itertools.chain.from_iterable(
-            itertools.combinations(s, r) for r in range(len(s) + 1)
-        )
-    ]
+    for subset in itertools.chain.from_iterable(
+        itertools.combinations(s, r) for r in range(len(s) + 1)
+    ):
+        yield set(subset)
+
+
+def families(people):
+    """
+    Split `people` into groups of people related through their parents.
+    Return a list of dictionaries in the same format as `people`.
+    """
+    # Union-find over names, joining every child with their parents
+    root = {person: person for person in people}
+
+    def find(person):
+        while root[person] != person:
+            root[person] = root[root[person]]
+            person = root[person]
+        return person
+
+    for person in people:
+        for parent in (people[person]["mother"], people[person]["father"]):
+            if parent is not None:
+                root[find(person)] = find(parent)
+
+    groups = dict()
+    for person in people:
+        groups.setdefault(find(person), dict())[person] = people[person]
+    return list(groups.values())
+
+
+def assignments(people):
+    """
+    Lazily generate every assignment of genes and traits to `people` that
+    agrees with the known traits and has nonzero probability, as tuples
+    (genes, traits) of lists in the order of `people`, ready to be scored
+    by joint_probabilities.
+
+    People are assigned parents first, so a partial assignment that gives
+    anyone a gene count or trait of probability zero is abandoned along
+    with all of its extensions.
+    """
+    order = elimination.parents_first(people)
+    genes = dict()
+    traits = dict()
+
+    def extend(i):
+        if i == len(order):
+            yield (
+                [genes[person] for person in people],
+                [traits[person] for person in people]
+            )
+            return
+        person = order[i]
+        mother = people[person]["mother"]
+        father = people[person]["father"]
+        known = people[person]["trait"]
+        for n in (0, 1, 2):
+            if mother is None:
+                gene_p = PROBS["gene"][n]
+            else:
+                gene_p = INHERITANCE[genes[mother]][genes[father]][n]
+            if gene_p == 0:
+                continue
+            genes[person] = n
+            for trait in ((True, False) if known is None else (known,)):
+                if PROBS["trait"][n][trait] == 0:
+                    continue
+                traits[person] = trait
+                yield from extend(i + 1)
+
+    return extend(0)
 
 
 def joint_probability(people, one_gene, two_genes, have_trait):
@@ -139,135 +278,59 @@ def joint_probability(people, one_gene, two_genes, have_trait):
         * everyone in set `have_trait` has the trait, and
         * everyone not in set` have_trait` does not have the trait.
     """
+    genes = {
+        person: 1 if person in one_gene else 2 if person in two_genes else 0
+        for person in people
+    }
     jointProb = 1
     for person in people:
-        #calculate for people in one_gene first!
-        if person in one_gene:
-            #check if they have parents, it can be assumed that they either have none or both
-            if people[person]["mother"] == None:
-                jointProb *= PROBS["gene"][1]
-
-            else:
-                if people[person]["mother"] not in (one_gene|two_genes) and people[person]["father"] in one_gene:
-                #mother has prob[mutation] father has 50%
-                    jointProb *= (0.5 * PROBS["mutation"]) + (0.5 * (1 - PROBS["mutation"]))
-                elif people[person]["mother"] not in (one_gene|two_genes) and people[person]["father"] in two_genes:
-                #mother has prob[mutation], father has (1-prob[mutation])
-                    jointProb *= (1-PROBS["mutation"] * (1-PROBS["mutation"])) + (PROBS["mutation"] * PROBS["mutation"])
-                elif people[person]["mother"] not in (one_gene|two_genes) and people[person]["father"] not in (one_gene|two_genes):
-                #mother has prob[mutation], father has probs[mutation]
-                    jointProb *= (PROBS["mutation"] * (1 - PROBS["mutation"])) *2
-                elif people[person]["mother"] in one_gene and people[person]["father"] in one_gene:
-                #both mother and father have 50% chance of passing gene - mother and not father, father and not mother
-                    jointProb *= (0.5 * 0.5) * 2
-                elif people[person]["mother"] in one_gene and people[person]["father"] in two_genes:
-                #mother has 50% chance of passing, father has 1-prob[mutation] chance of passing
-                    jointProb *= 0.5 * (1 - PROBS["mutation"]) + 0.5 * PROBS["mutation"]
-                elif people[person]["mother"] in one_gene and people[person]["father"] not in (one_gene or two_genes):
-                #mother has 50% chance of passing, father has prob[mutation] chance of passing
-                    jointProb *= 0.5 * (1 - PROBS["mutation"]) + 0.5 * PROBS["mutation"] 
-                #mother in two genes
-                elif people[person]["mother"] in two_genes and people[person]["father"] in one_gene:
-                    #father has 50% chance of passing, mother has 1-prob[mutation] chance of passing
-                    jointProb *= 0.5 * (1 - PROBS["mutation"]) + 0.5 * PROBS["mutation"]
-                elif people[person]["mother"] in two_genes and people[person]["father"] in two_genes:
-                    #both mother and father have 1-prob[mutation] chance of passing gene
-                    jointProb *= (1-PROBS["mutation"]) * PROBS["mutation"] * 2
-                elif people[person]["mother"] in two_genes and people[person]["father"] not in (one_gene or two_genes):
-                    #mother has 1-prob[mutation], father has prob["mutation"]
-                    jointProb *= (1-PROBS["mutation"] * (1-PROBS["mutation"])) + (PROBS["mutation"] * PROBS["mutation"])
-
-            #if the person has the trait or doesn't
-            if person in have_trait:
-                jointProb *= PROBS["trait"][1][True]
-            else:
-                jointProb *= PROBS["trait"][1][False]
+        mother = people[person]["mother"]
+        father = people[person]["father"]
 
-        #calculate for two_genes, following same logic
-        elif person in two_genes:
-            #check if they have parents, it can be assumed that they either have none or both
-            if people[person]["mother"] == None:
-                jointProb *= PROBS["gene"][2]
-
-            else:
-                if people[person]["mother"] not in (one_gene|two_genes) and people[person]["father"] in one_gene:
-                #mother has prob[mutation] father has 50%
-                    jointProb *= 0.5 * PROBS["mutation"]
-                elif people[person]["mother"] not in (one_gene|two_genes) and people[person]["father"] in two_genes:
-                #mother has prob[mutation], father has (1-prob[mutation])
-                    jointProb *= PROBS["mutation"] * (1 - PROBS["mutation"])
-                elif people[person]["mother"] not in (one_gene|two_genes) and people[person]["father"] not in (one_gene|two_genes):
-                #mother has prob[mutation], father has probs[mutation]
-                    jointProb *= PROBS["mutation"] * PROBS["mutation"]
-                elif people[person]["mother"] in one_gene and people[person]["father"] in one_gene:
-                #both mother and father have 50% chance of passing gene
-                    jointProb *= (0.5 * 0.5)
-                elif people[person]["mother"] in one_gene and people[person]["father"] in two_genes:
-                #mother has 50% chance of passing, father has 1-prob[mutation] chance of passing
-                    jointProb *= 0.5 * (1 - PROBS["mutation"])
-                elif people[person]["mother"] in one_gene and people[person]["father"] not in (one_gene or two_genes):
-                #mother has 50% chance of passing, father has prob[mutation] chance of passing
-                    jointProb *= 0.5 * PROBS["mutation"] 
-                #mother in two genes
-                elif people[person]["mother"] in two_genes and people[person]["father"] in one_gene:
-                    #father has 50% chance of passing, mother has 1-prob[mutation] chance of passing
-                    jointProb *= 0.5 * (1 - PROBS["mutation"]) 
-                elif people[person]["mother"] in two_genes and people[person]["father"] in two_genes:
-                    #both mother and father have 1-prob[mutation] chance of passing gene
-                    jointProb *= (1-PROBS["mutation"]) * (1 - PROBS["mutation"])
-                elif people[person]["mother"] in two_genes and people[person]["father"] not in (one_gene or two_genes):
-                    #mother has 1-prob[mutation], father has prob["mutation"]
-                    jointProb *= (1-PROBS["mutation"]) * PROBS["mutation"]
-
-            #if the person has the trait or doesn't
-            if person in have_trait:
-                jointProb *= PROBS["trait"][2][True]
-            else:
-                jointProb *= PROBS["trait"][2][False]
-
-        #calculate for no genes, same logic:
+        #people without parents get the unconditional probability,
+        #everyone else looks up their parents' gene counts in the table
+        if mother is None:
+            jointProb *= PROBS["gene"][genes[person]]
         else:
-            if people[person]["mother"] == None:
-                jointProb *= PROBS["gene"][0]
+            jointProb *= INHERITANCE[genes[mother]][genes[father]][genes[person]]
 
-            else:
-                if people[person]["mother"] not in (one_gene|two_genes) and people[person]["father"] in one_gene:
-                #mother has prob[mutation] father has 50%
-                    jointProb *= 0.5 * (1-PROBS["mutation"])
-                elif people[person]["mother"] not in (one_gene|two_genes) and people[person]["father"] in two_genes:
-                #mother has prob[mutation], father has (1-prob[mutation])
-                    jointProb *= PROBS["mutation"] * (1 - PROBS["mutation"])
-                elif people[person]["mother"] not in (one_gene|two_genes) and people[person]["father"] not in (one_gene|two_genes):
-                #mother has prob[mutation], father has probs[mutation]
-                    jointProb *= (1-PROBS["mutation"]) * (1-PROBS["mutation"])
-                elif people[person]["mother"] in one_gene and people[person]["father"] in one_gene:
-                #both mother and father have 50% chance of passing gene
-                    jointProb *= (0.5 * 0.5)
-                elif people[person]["mother"] in one_gene and people[person]["father"] in two_genes:
-                #mother has 50% chance of passing, father has 1-prob[mutation] chance of passing
-                    jointProb *= 0.5 * (PROBS["mutation"])
-                elif people[person]["mother"] in one_gene and people[person]["father"] not in (one_gene or two_genes):
-                #mother has 50% chance of passing, father has prob[mutation] chance of passing
-                    jointProb *= 0.5 * (1-PROBS["mutation"]) 
-                #mother in two genes
-                elif people[person]["mother"] in two_genes and people[person]["father"] in one_gene:
-                    #father has 50% chance of passing, mother has 1-prob[mutation] chance of passing
-                    jointProb *= 0.5 * PROBS["mutation"] 
-                elif people[person]["mother"] in two_genes and people[person]["father"] in two_genes:
-                    #both mother and father have 1-prob[mutation] chance of passing gene
-                    jointProb *= PROBS["mutation"] * PROBS["mutation"]
-                elif people[person]["mother"] in two_genes and people[person]["father"] not in (one_gene or two_genes):
-                    #mother has 1-prob[mutation], father has prob["mutation"]
-                    jointProb *= (1-PROBS["mutation"]) * PROBS["mutation"]
-
-            #if the person has the trait or doesn't
-            if person in have_trait:
-                jointProb *= PROBS["trait"][0][True]
-            else:
-                jointProb *= PROBS["trait"][0][False]
+        jointProb *= PROBS["trait"][genes[person]][person in have_trait]
+    return jointProb
 
 
-    return jointProb
+def joint_probabilities(people, genes, traits):
+    """
+    Compute the joint probability of many assignments at once.
+
+    `genes` is an integer array and `traits` a boolean array, both of shape
+    (assignments, people) with columns in the order of `people`. Returns
+    an array with the joint probability of each row, as joint_probability
+    would compute for the same assignment.
+    """
+    genes = np.asarray(genes)
+    traits = np.asarray(traits, dtype=int)
+    names = list(people)
+    column = {person: i for i, person in enumerate(names)}
+    founders = [i for i, person in enumerate(names)
+                if people[person]["mother"] is None]
+    children = [i for i, person in enumerate(names)
+                if people[person]["mother"] is not None]
+    mothers = [column[people[names[i]]["mother"]] for i in children]
+    fathers = [column[people[names[i]]["father"]] for i in children]
+
+    gene = np.array([PROBS["gene"][n] for n in range(3)])
+    trait = np.array([
+        [PROBS["trait"][n][False], PROBS["trait"][n][True]] for n in range(3)
+    ])
+    inheritance = np.array(INHERITANCE)
+
+    return (
+        gene[genes[:, founders]].prod(axis=1) *
+        inheritance[
+            genes[:, mothers], genes[:, fathers], genes[:, children]
+        ].prod(axis=1) *
+        trait[genes, traits].prod(axis=1)
+    )
 
 
 def update(probabilities, one_gene, two_genes, have_trait, p):
@@ -0,0 +1,215 @@
+import math
+import multiprocessing
+import random
+
+from elimination import (
+    GENES, inheritance_table, parents_first, trait_distribution
+)
+
+# Independent sample streams (and Gibbs chains) to run by default
+CHAINS = 4
+
+# Fraction of each Gibbs chain discarded before counting samples
+BURN_IN = 0.1
+
+
+def likelihood_weighting(people, probs, samples, seed=None, chains=CHAINS,
+                         workers=1):
+    """
+    Estimate gene and trait distributions for everyone in `people` by
+    likelihood weighting: genes are sampled parents first, and each sample
+    is weighted by the probability of the known traits given its genes.
+
+    `samples` are split over `chains` independently seeded streams (fewer
+    if there are fewer samples), run in `workers` processes. Return
+    (probabilities, diagnostics), where probabilities is in the format of
+    heredity.py and diagnostics reports the effective sample size of the
+    weighted samples.
+    """
+    chains = min(chains, samples)
+    results = run(people, probs, "likelihood", samples, seed, chains, workers)
+    weights = sum(result["weight"] for result in results)
+    squares = sum(result["squares"] for result in results)
+    diagnostics = {
+        "samples": samples,
+        "chains": chains,
+        "effective_samples": weights ** 2 / squares if squares else 0
+    }
+    return combine(people, probs, results), diagnostics
+
+
+def gibbs(people, probs, samples, seed=None, chains=CHAINS, workers=1,
+          burn_in=BURN_IN):
+    """
+    Estimate gene and trait distributions for everyone in `people` by
+    Gibbs sampling: each sweep resamples every person's genes given their
+    parents', their children's and their spouses', and their known trait.
+
+    `samples` sweeps are split over `chains` independently seeded chains
+    (fewer if there are fewer sweeps), run in `workers` processes, each
+    discarding its first `burn_in` fraction of sweeps. Return
+    (probabilities, diagnostics), where diagnostics reports the largest
+    Gelman-Rubin R-hat over every person's gene counts (values near 1
+    indicate convergence).
+    """
+    chains = min(chains, samples)
+    results = run(
+        people, probs, "gibbs", samples, seed, chains, workers, burn_in
+    )
+    diagnostics = {
+        "samples": samples,
+        "chains": chains,
+        "r_hat": r_hat(people, results)
+    }
+    return combine(people, probs, results), diagnostics
+
+
+def run(people, probs, method, samples, seed, chains, workers, burn_in=0):
+    """
+    Run `chains` streams of `method`, sharing `samples` between them,
+    and return the list of their results.
+    """
+    if samples < 1:
+        raise ValueError("samples must be at least 1")
+    tasks = [
+        (people, probs, method, samples // chains + (i < samples % chains),
+         None if seed is None else f"{seed}-{i}", burn_in)
+        for i in range(chains)
+    ]
+    if min(workers, chains) == 1:
+        return [sample_chain(task) for task in tasks]
+    with multiprocessing.Pool(min(workers, chains)) as pool:
+        return pool.map(sample_chain, tasks)
+
+
+def sample_chain(task):
+    """
+    Draw one stream of samples. Return a dictionary with the total weight
+    of the samples, the sum of squared weights, and for every person the
+    weight of samples in which they have 0, 1 or 2 copies of the gene.
+    """
+    people, probs, method, samples, seed, burn_in = task
+    rng = random.Random(seed)
+    inheritance = inheritance_table(probs["mutation"])
+    order = parents_first(people)
+    counts = {person: [0, 0, 0] for person in people}
+    weight = 0
+    squares = 0
+
+    def forward():
+        """Sample genes parents first, ignoring trait evidence."""
+        genes = dict()
+        for person in order:
+            mother = people[person]["mother"]
+            father = people[person]["father"]
+            if mother is None:
+                distribution = [probs["gene"][n] for n in GENES]
+            else:
+                distribution = inheritance[genes[mother]][genes[father]]
+            genes[person] = rng.choices(GENES, distribution)[0]
+        return genes
+
+    def evidence(person, n):
+        trait = people[person]["trait"]
+        return 1 if trait is None else probs["trait"][n][trait]
+
+    if method == "likelihood":
+        for i in range(samples):
+            genes = forward()
+            w = 1
+            for person in people:
+                w *= evidence(person, genes[person])
+            for person in people:
+                counts[person][genes[person]] += w
+            weight += w
+            squares += w * w
+
+    else:
+        children = {person: [] for person in people}
+        for person in people:
+            for parent in (people[person]["mother"], people[person]["father"]):
+                if parent is not None:
+                    children[parent].append(person)
+
+        genes = forward()
+        for sweep in range(samples):
+            for person in order:
+                mother = people[person]["mother"]
+                father = people[person]["father"]
+                distribution = []
+                for n in GENES:
+                    genes[person] = n
+                    if mother is None:
+                        p = probs["gene"][n]
+                    else:
+                        p = inheritance[genes[mother]][genes[father]][n]
+                    p *= evidence(person, n)
+                    for child in children[person]:
+                        p *= inheritance[
+                            genes[people[child]["mother"]]
+                        ][
+                            genes[people[child]["father"]]
+                        ][genes[child]]
+                    distribution.append(p)
+                genes[person] = rng.choices(GENES, distribution)[0]
+
+            # Every sweep after burn-in counts as one sample
+            if sweep >= int(samples * burn_in):
+                for person in people:
+                    counts[person][genes[person]] += 1
+                weight += 1
+                squares += 1
+
+    return {"counts": counts, "weight": weight, "squares": squares}
+
+
+def combine(people, probs, results):
+    """
+    Merge the results of sample_chain into a `probabilities` dictionary,
+    with nan for anyone whose samples carry no weight at all.
+    """
+    probabilities = dict()
+    for person in people:
+        totals = [
+            sum(result["counts"][person][n] for result in results)
+            for n in GENES
+        ]
+        # No sample carries any weight if every one contradicts the
+        # known traits, which leaves nothing to estimate from
+        total = sum(totals)
+        distribution = {
+            n: totals[n] / total if total else math.nan for n in GENES
+        }
+        probabilities[person] = {
+            "gene": {n: distribution[n] for n in (2, 1, 0)},
+            "trait": trait_distribution(
+                distribution, people[person]["trait"], probs
+            )
+        }
+    return probabilities
+
+
+def r_hat(people, results):
+    """
+    Return the largest Gelman-Rubin potential scale reduction factor over
+    the indicator of each person having 0, 1 or 2 copies of the gene,
+    comparing the variance within each chain to the variance between them.
+    """
+    n = min(result["weight"] for result in results)
+    if len(results) < 2 or n < 2:
+        return math.nan
+    worst = 1.0
+    for person in people:
+        for genes in GENES:
+            means = [
+                result["counts"][person][genes] / result["weight"]
+                for result in results
+            ]
+            within = sum(m * (1 - m) for m in means) / len(means) * n / (n - 1)
+            grand = sum(means) / len(means)
+            between = n * sum((m - grand) ** 2 for m in means) / (len(means) - 1)
+            if within == 0:
+                continue
+            pooled = (n - 1) / n * within + between / n
+            worst = max(worst, math.sqrt(pooled / within))
+    return worst
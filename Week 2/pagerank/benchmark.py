@@ -0,0 +1,110 @@
+import json
+import os
+import sys
+
+import numpy as np
+
+from graph import (
+    ConvergenceReport, LinkGraph, power_iteration, random_surfers
+)
+from pagerank import DAMPING, REFERENCE_TOLERANCE, crawl
+
+CORPORA = ["corpus0", "corpus1", "corpus2"]
+
+# Synthetic graphs as (pages, average links per page)
+SYNTHETIC = [(1000, 8), (10000, 8), (100000, 8)]
+
+# Exponent of the power law that page popularity and link counts follow
+EXPONENT = 2.1
+
+# Samples drawn per graph, by this many surfers at once
+SAMPLES = 1000000
+WALKERS = 1000
+
+COLUMNS = [
+    ("Graph", 16), ("Pages", 7), ("Links", 8), ("Iters", 5),
+    ("Residual", 9), ("Iterate (s)", 11), ("Samples", 8),
+    ("L1 error", 9), ("Sample (s)", 10)
+]
+
+
+def main():
+    if len(sys.argv) not in [1, 2]:
+        sys.exit("Usage: python benchmark.py [report.json]")
+
+    directory = os.path.dirname(os.path.abspath(__file__))
+    workloads = [
+        (name, LinkGraph.from_corpus(crawl(os.path.join(directory, name))))
+        for name in CORPORA
+    ]
+    for pages, links in SYNTHETIC:
+        workloads.append((
+            f"power-law {pages}", power_law_graph(pages, links, seed=pages)
+        ))
+
+    print_header()
+    results = []
+    for name, graph in workloads:
+        iterations = ConvergenceReport()
+        ranks = power_iteration(graph, DAMPING, report=iterations)
+        reference = power_iteration(
+            graph, DAMPING, ranks, tolerance=REFERENCE_TOLERANCE
+        )
+        samples = ConvergenceReport(reference)
+        random_surfers(graph, DAMPING, SAMPLES, WALKERS, seed=0,
+                       report=samples)
+        print_row(name, graph, iterations, samples)
+        results.append({
+            "graph": name,
+            "pages": len(graph),
+            "links": len(graph.targets),
+            "iterate": iterations.to_dict()["iterations"],
+            "sample": samples.to_dict()["samples"]
+        })
+
+    if len(sys.argv) == 2:
+        with open(sys.argv[1], "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Wrote per-iteration and per-checkpoint report to {sys.argv[1]}")
+
+
+def power_law_graph(pages, links, exponent=EXPONENT, seed=None):
+    """
+    Return a random LinkGraph of `pages` pages with about `links` links
+    per page, where both the number of links on a page and how often a
+    page is linked to follow a power law with the given `exponent`.
+    """
+    rng = np.random.default_rng(seed)
+    degrees = np.minimum(rng.zipf(exponent, size=pages), pages - 1)
+    degrees = np.round(degrees * links / degrees.mean()).astype(np.int64)
+    popularity = np.arange(1, pages + 1) ** (-1 / (exponent - 1))
+    popularity = rng.permutation(popularity / popularity.sum())
+    sources = np.repeat(np.arange(pages), degrees)
+    targets = rng.choice(pages, size=len(sources), p=popularity)
+    return LinkGraph([f"{i}.html" for i in range(pages)], sources, targets)
+
+
+def print_header():
+    print(" ".join(f"{title:>{width}}" for title, width in COLUMNS))
+    print(" ".join("-" * width for _, width in COLUMNS))
+
+
+def print_row(name, graph, iterations, samples):
+    """
+    Print the final residual and error of one graph's reports.
+    """
+    last = iterations.iterations[-1]
+    sampled = samples.samples[-1]
+    values = [
+        name, len(graph), len(graph.targets), last["iteration"],
+        f"{last['residual']:.2e}", f"{last['seconds']:.4f}",
+        sampled["samples"], f"{sampled['error']:.4f}",
+        f"{sampled['seconds']:.3f}"
+    ]
+    print(" ".join(
+        f"{value:>{width}}" for value, (_, width) in zip(values, COLUMNS)
+    ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+
+import numpy as np
+
+LINK = re.compile(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"")
+
+# Characters of HTML read at a time
+CHUNK_SIZE = 1 << 16
+
+# Directories with at least this many pages are parsed in a process pool
+PARALLEL_THRESHOLD = 1000
+
+# Where cached_crawl_edges keeps parsed links between runs
+CACHE_DIRECTORY = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), ".linkcache"
+)
+
+
+def crawl_edges(directory, processes=None):
+    """
+    Parse a directory of HTML pages for links to other pages in it.
+    Return (pages, sources, targets): the list of page filenames and
+    arrays of page numbers such that pages[sources[i]] links to
+    pages[targets[i]]. Self links and links outside the corpus are dropped.
+
+    Pages are parsed as by parse_all.
+    """
+    pages = list_pages(directory)
+    index = {page: i for i, page in enumerate(pages)}
+    sources = []
+    targets = []
+    paths = [os.path.join(directory, page) for page in pages]
+    for source, links in enumerate(parse_all(paths, processes)):
+        for link in links:
+            target = index.get(link)
+            if target is not None and target != source:
+                sources.append(source)
+                targets.append(target)
+
+    return (pages, np.array(sources, dtype=np.int64),
+            np.array(targets, dtype=np.int64))
+
+
+def cached_crawl_edges(directory, processes=None, cache=CACHE_DIRECTORY):
+    """
+    Return the same (pages, sources, targets) as crawl_edges, reusing
+    the links parsed by earlier calls for the same directory.
+
+    The cache holds every page's links (including links outside the
+    corpus, which a page added later may satisfy) as an array of link
+    name numbers, memory mapped when loaded. Only pages whose modification
+    time or size differ from the cache are parsed again, and the cache is
+    rewritten only if something changed.
+    """
+    pages = list_pages(directory)
+    stats = [os.stat(os.path.join(directory, page)) for page in pages]
+    stamps = [[stat.st_mtime_ns, stat.st_size] for stat in stats]
+
+    key = hashlib.sha1(os.path.abspath(directory).encode()).hexdigest()[:16]
+    base = os.path.join(cache, key)
+    header, links, offsets = load_cache(base)
+
+    # Reuse the cached links of every page that has not changed
+    cached = dict()
+    if header is not None:
+        for i, page in enumerate(header["pages"]):
+            cached[page] = (header["stamps"][i], i)
+    unchanged = [
+        page in cached and cached[page][0] == stamp
+        for page, stamp in zip(pages, stamps)
+    ]
+
+    if header is None or not all(unchanged) or len(pages) != len(cached):
+        names = list(header["names"]) if header is not None else []
+        name_index = {name: i for i, name in enumerate(names)}
+        changed = [
+            os.path.join(directory, page)
+            for page, same in zip(pages, unchanged) if not same
+        ]
+        parsed = iter(parse_all(changed, processes))
+
+        page_links = []
+        for page, same in zip(pages, unchanged):
+            if same:
+                i = cached[page][1]
+                page_links.append(links[offsets[i]:offsets[i + 1]])
+                continue
+            numbers = []
+            for link in sorted(next(parsed)):
+                if link not in name_index:
+                    name_index[link] = len(names)
+                    names.append(link)
+                numbers.append(name_index[link])
+            page_links.append(np.array(numbers, dtype=np.int64))
+
+        offsets = np.zeros(len(pages) + 1, dtype=np.int64)
+        np.cumsum([len(numbers) for numbers in page_links], out=offsets[1:])
+        links = (np.concatenate(page_links) if page_links
+                 else np.zeros(0, dtype=np.int64))
+        header = {
+            "directory": os.path.abspath(directory),
+            "pages": pages,
+            "stamps": stamps,
+            "names": names
+        }
+        save_cache(base, header, links, offsets)
+
+    # Map link names to page numbers, dropping links outside the corpus
+    index = {page: i for i, page in enumerate(pages)}
+    name_pages = np.array(
+        [index.get(name, -1) for name in header["names"]], dtype=np.int64
+    )
+    sources = np.repeat(np.arange(len(pages)), np.diff(offsets))
+    targets = name_pages[links] if len(links) else np.zeros(0, np.int64)
+    keep = (targets >= 0) & (targets != sources)
+    return pages, sources[keep], targets[keep]
+
+
+def load_cache(base):
+    """
+    Return (header, links, offsets) from the cache files at `base`,
+    with the arrays memory mapped, or (None, None, None) if there are none.
+    """
+    try:
+        with open(base + ".json") as f:
+            header = json.load(f)
+        links = np.load(base + ".links.npy", mmap_mode="r")
+        offsets = np.load(base + ".offsets.npy", mmap_mode="r")
+    except (OSError, ValueError):
+        return None, None, None
+    return header, links, offsets
+
+
+def save_cache(base, header, links, offsets):
+    """
+    Write cache files at `base`, replacing each file atomically.
+    The header is written last, so it never describes missing arrays.
+    """
+    os.makedirs(os.path.dirname(base), exist_ok=True)
+    for suffix, array in [(".links.npy", links), (".offsets.npy", offsets)]:
+        with open(base + suffix + ".tmp", "wb") as f:
+            np.save(f, np.asarray(array))
+        os.replace(base + suffix + ".tmp", base + suffix)
+    with open(base + ".json.tmp", "w") as f:
+        json.dump(header, f)
+    os.replace(base + ".json.tmp", base + ".json")
+
+
+def list_pages(directory):
+    """
+    Return the sorted filenames of the HTML pages in `directory`.
+    """
+    return sorted(
+        filename for filename in os.listdir(directory)
+        if filename.endswith(".html")
+    )
+
+
+def parse_all(paths, processes=None):
+    """
+    Return the sets of link targets of the HTML files at `paths`, in order,
+    parsed in `processes` worker processes; by default, every CPU for at
+    least PARALLEL_THRESHOLD files and the current process otherwise.
+    """
+    if processes is None:
+        processes = (multiprocessing.cpu_count()
+                     if len(paths) >= PARALLEL_THRESHOLD else 1)
+    if processes == 1:
+        return [parse_links(path) for path in paths]
+    with multiprocessing.Pool(processes) as pool:
+        chunksize = max(1, len(paths) // (processes * 16))
+        return pool.map(parse_links, paths, chunksize=chunksize)
+
+
+def parse_links(path):
+    """
+    Return the set of link targets in the HTML file at `path`, reading it
+    CHUNK_SIZE characters at a time. Text after the last ">" of a chunk is
+    carried into the next one, so tags split between chunks still match.
+    """
+    links = set()
+    carry = ""
+    with open(path) as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            text = carry + chunk
+            if not chunk:
+                links.update(LINK.findall(text))
+                return links
+            cut = text.rfind(">") + 1
+            links.update(LINK.findall(text, 0, cut))
+            carry = text[cut:]
@@ -0,0 +1,493 @@
+import collections
+import heapq
+import math
+import multiprocessing
+import random
+import time
+
+import numpy as np
+import scipy.sparse
+
+# Stop iterating once the ranks change by less than this in total (L1)
+TOLERANCE = 1e-6
+
+# Give up on convergence after this many iterations
+MAX_ITERATIONS = 1000
+
+# push_update and top_k fall back to power iteration once pushing would
+# reach more than this fraction of the pages
+PUSH_FRONTIER = 0.1
+
+# Surfers run until a page's rank depends on where they started by at most
+# this much before their visits count (see burn_in)
+BURN_IN_TOLERANCE = 1e-3
+
+# Push a page's personalized PageRank residual once it exceeds this per link
+PUSH_EPSILON = 1e-4
+
+# Smallest push threshold top_k tries before settling for an uncertain order
+MIN_PUSH_EPSILON = 1e-9
+
+
+class LinkGraph():
+    """
+    A corpus of pages with pages numbered 0..n-1 and links stored as
+    compressed sparse rows: the pages linked to by page i are
+    targets[offsets[i]:offsets[i + 1]].
+    """
+
+    def __init__(self, pages, sources, targets):
+        """
+        Build a graph from a list of page names and parallel arrays of
+        link source and target page numbers. Self links and duplicate
+        links are dropped.
+        """
+        self.pages = list(pages)
+        self.index = {page: i for i, page in enumerate(self.pages)}
+        n = len(self.pages)
+
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        keep = sources != targets
+        links = np.unique(sources[keep] * n + targets[keep])
+        sources, targets = np.divmod(links, n)
+
+        # Links are sorted by source, so each page's links are contiguous
+        self.out_degree = np.bincount(sources, minlength=n)
+        self.offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(self.out_degree, out=self.offsets[1:])
+        self.targets = targets
+        self.dangling = self.out_degree == 0
+
+        # transitions[j, i]: probability of following a link from i to j
+        self.transitions = scipy.sparse.csr_matrix(
+            (1 / self.out_degree[sources], (targets, sources)), shape=(n, n)
+        )
+
+    def __len__(self):
+        return len(self.pages)
+
+    @classmethod
+    def from_corpus(cls, corpus):
+        """
+        Build a graph from a dictionary mapping each page to the set of
+        pages it links to, as returned by crawl.
+        """
+        pages = list(corpus)
+        index = {page: i for i, page in enumerate(pages)}
+        sources = []
+        targets = []
+        for page in pages:
+            for link in corpus[page]:
+                sources.append(index[page])
+                targets.append(index[link])
+        return cls(pages, sources, targets)
+
+    def links(self, i):
+        """
+        Return the array of page numbers linked to by page number i.
+        """
+        return self.targets[self.offsets[i]:self.offsets[i + 1]]
+
+    def to_dict(self, vector):
+        """
+        Return a dictionary mapping each page name to its value in `vector`.
+        """
+        return {page: float(value) for page, value in zip(self.pages, vector)}
+
+
+class ConvergenceReport():
+    """
+    Telemetry collected by power_iteration and the random surfers: the L1
+    residual after each iteration, or the L1 error against `reference` (a
+    PageRank vector) after a growing number of samples, each with the wall
+    time elapsed since the computation began.
+    """
+
+    def __init__(self, reference=None):
+        self.reference = reference
+        self.iterations = []
+        self.samples = []
+        self.start = time.perf_counter()
+
+    def begin(self):
+        """
+        Restart the clock, at the start of a computation.
+        """
+        self.start = time.perf_counter()
+
+    def record_iteration(self, residual):
+        """
+        Record the residual of the next iteration.
+        """
+        self.iterations.append({
+            "iteration": len(self.iterations) + 1,
+            "residual": float(residual),
+            "seconds": time.perf_counter() - self.start
+        })
+
+    def record_samples(self, samples, counts):
+        """
+        Record the error of the estimate `counts` / `samples`.
+        """
+        error = None
+        if self.reference is not None:
+            error = float(np.abs(
+                np.asarray(counts) / samples - self.reference
+            ).sum())
+        self.samples.append({
+            "samples": samples,
+            "error": error,
+            "seconds": time.perf_counter() - self.start
+        })
+
+    def to_dict(self):
+        """
+        Return the report as a dictionary of lists, ready for JSON.
+        """
+        return {"iterations": self.iterations, "samples": self.samples}
+
+
+def checkpoints(n):
+    """
+    Return the sample counts at which to record a ConvergenceReport
+    while drawing `n` samples: every power of two, then `n`.
+    """
+    stops = []
+    stop = 1
+    while stop < n:
+        stops.append(stop)
+        stop *= 2
+    return stops + [n]
+
+
+def power_iteration(graph, damping_factor, ranks=None,
+                    tolerance=TOLERANCE, max_iterations=MAX_ITERATIONS,
+                    report=None, teleport=None):
+    """
+    Return the PageRank vector of `graph`, iterating
+        PR = (1 - d) / N + d * (links into each page + dangling mass / N)
+    from `ranks` (uniform by default) until the L1 change between
+    iterations falls below `tolerance`. Pages without links are treated
+    as linking to every page, including themselves.
+
+    For personalized PageRank, `teleport` is a vector of the probability
+    of teleporting to each page, which then takes the place of 1 / N.
+
+    If `report` is a ConvergenceReport, every iteration's residual is
+    recorded in it.
+    """
+    n = len(graph)
+    if report is not None:
+        report.begin()
+    if ranks is None:
+        ranks = np.full(n, 1 / n)
+    if teleport is None:
+        teleport = 1 / n
+    for _ in range(max_iterations):
+        dangling = ranks[graph.dangling].sum()
+        updated = (
+            (1 - damping_factor) * teleport +
+            damping_factor * (graph.transitions @ ranks + dangling * teleport)
+        )
+        change = np.abs(updated - ranks).sum()
+        ranks = updated
+        if report is not None:
+            report.record_iteration(change)
+        if change < tolerance:
+            break
+    return ranks
+
+
+def random_surfer(graph, damping_factor, n, seed=None, report=None):
+    """
+    Return how many of `n` samples of a single random surfer land on each
+    page. The surfer starts on a random page; each step follows a random
+    link with probability `damping_factor` (or always jumps, from a page
+    with no links) and otherwise jumps to a random page.
+
+    Links are picked by offset into the CSR arrays, so a step costs O(1)
+    regardless of the number of pages. If `report` is a ConvergenceReport,
+    the estimate is recorded in it at every checkpoint.
+    """
+    rng = random.Random(seed)
+    pages = len(graph)
+    offsets = graph.offsets.tolist()
+    degrees = graph.out_degree.tolist()
+    targets = graph.targets.tolist()
+    counts = [0] * pages
+    if report is not None:
+        report.begin()
+
+    page = rng.randrange(pages)
+    done = 0
+    for stop in (checkpoints(n) if report is not None else [n]):
+        for _ in range(stop - done):
+            counts[page] += 1
+            degree = degrees[page]
+            if degree and rng.random() < damping_factor:
+                page = targets[offsets[page] + int(rng.random() * degree)]
+            else:
+                page = rng.randrange(pages)
+        done = stop
+        if report is not None:
+            report.record_samples(done, counts)
+    return np.array(counts)
+
+
+def random_surfers(graph, damping_factor, n, walkers, seed=None,
+                   report=None):
+    """
+    Return how many of `n` samples land on each page, as random_surfer,
+    but advancing `walkers` independent surfers together with NumPy so
+    each step is one vectorized operation over all surfers.
+
+    Each surfer starts on a random page and takes burn_in steps before
+    its visits count, so that many short walks are not biased toward the
+    uniform starting distribution.
+
+    If `report` is a ConvergenceReport, the estimate is recorded in it
+    after the first step that reaches each checkpoint.
+    """
+    rng = np.random.default_rng(seed)
+    pages = len(graph)
+    counts = np.zeros(pages, dtype=np.int64)
+    positions = rng.integers(pages, size=walkers)
+    remaining = n
+
+    def step(positions):
+        """Move every surfer one step."""
+        # Surfers that follow a link pick one by offset into their page's links
+        degrees = graph.out_degree[positions]
+        follow = (rng.random(len(positions)) < damping_factor) & (degrees > 0)
+        jumps = rng.integers(pages, size=len(positions))
+        choice = (rng.random(follow.sum()) * degrees[follow]).astype(np.int64)
+        starts = graph.offsets[positions[follow]]
+        jumps[follow] = graph.targets[starts + choice]
+        return jumps
+
+    for _ in range(burn_in(damping_factor)):
+        positions = step(positions)
+    stops = []
+    if report is not None:
+        report.begin()
+        stops = checkpoints(n)[::-1]
+
+    # Visits are buffered so that counting costs O(pages) only once
+    # at least that many samples have been drawn
+    visited = []
+    buffered = 0
+    while remaining > 0:
+        if remaining < walkers:
+            positions = positions[:remaining]
+        visited.append(positions)
+        buffered += len(positions)
+        remaining -= len(positions)
+        recording = bool(stops) and n - remaining >= stops[-1]
+        if buffered >= pages or remaining <= 0 or recording:
+            counts += np.bincount(np.concatenate(visited), minlength=pages)
+            visited = []
+            buffered = 0
+        if recording:
+            while stops and n - remaining >= stops[-1]:
+                stops.pop()
+            report.record_samples(n - remaining, counts)
+        positions = step(positions)
+    return counts
+
+
+def burn_in(damping_factor, tolerance=BURN_IN_TOLERANCE):
+    """
+    Return how many steps a surfer takes before its visits count: enough
+    for the chance that it has never jumped to a random page, and so still
+    depends on where it started, to fall below `tolerance`.
+    """
+    if damping_factor <= 0:
+        return 0
+    if damping_factor >= 1:
+        return MAX_ITERATIONS
+    return math.ceil(math.log(tolerance) / math.log(damping_factor))
+
+
+def parallel_surfers(graph, damping_factor, n, walkers=1, seed=None,
+                     processes=None):
+    """
+    Return how many of `n` samples land on each page, splitting the samples
+    over `processes` worker processes (all CPUs by default). Each process
+    gets its own RNG stream spawned from `seed`, runs random_surfer (or
+    random_surfers, with `walkers` greater than 1), and the counts are summed.
+    """
+    processes = processes or multiprocessing.cpu_count()
+    streams = np.random.SeedSequence(seed).spawn(processes)
+    tasks = [
+        (graph, damping_factor, n // processes + (i < n % processes),
+         walkers, int(stream.generate_state(1)[0]))
+        for i, stream in enumerate(streams)
+    ]
+    with multiprocessing.Pool(processes) as pool:
+        return sum(pool.map(surf, tasks))
+
+
+def surf(task):
+    """
+    Run one process's share of parallel_surfers.
+    """
+    graph, damping_factor, n, walkers, seed = task
+    if walkers == 1:
+        return random_surfer(graph, damping_factor, n, seed)
+    return random_surfers(graph, damping_factor, n, walkers, seed)
+
+
+def push_update(graph, ranks, damping_factor, tolerance=TOLERANCE,
+                frontier=PUSH_FRONTIER):
+    """
+    Return the PageRank vector of `graph`, solving the same equation as
+    power_iteration, warm-started from `ranks`: the PageRank vector of an
+    earlier version of the graph, rearranged to this one's pages, with 0
+    for each page that is new. If every value is 0, the ranks are found
+    from scratch.
+
+    One sparse product gives the residual of the PageRank equation at
+    `ranks`, which is large only around pages whose links changed. Every
+    page whose residual exceeds its share of `tolerance` (the change one
+    more power iteration would make there) then absorbs it and passes it
+    on through its links, in rounds that each handle every such page at
+    once, until no page is left above the threshold. If a round would
+    push from more than `frontier` of the pages, the change is not local,
+    and the rest of the work is left to power_iteration warm-started from
+    the ranks so far.
+
+    A residual shared equally by every page, as from a change in the
+    number of pages or from pages without links, only scales the result,
+    so it is never pushed: the ranks are divided by their sum instead.
+    """
+    n = len(graph)
+    d = damping_factor
+    ranks = np.array(ranks, dtype=float)
+    epsilon = tolerance / n
+
+    # No page kept its rank, so there is nothing to start from
+    if not ranks.any():
+        return power_iteration(graph, d, tolerance=tolerance)
+
+    # Residual of PR = (1 - d) / N + d * (links in + dangling rank / N)
+    residuals = (
+        (1 - d) / n +
+        d * (graph.transitions @ ranks + ranks[graph.dangling].sum() / n) -
+        ranks
+    )
+    # Drop the part of the residual that most pages share
+    residuals -= np.median(residuals)
+    active = np.flatnonzero(np.abs(residuals) > epsilon)
+    while len(active):
+        if len(active) > frontier * n:
+            return power_iteration(graph, d, ranks / ranks.sum(), tolerance)
+        pushed = residuals[active]
+        ranks[active] += pushed
+        residuals[active] = 0
+
+        # Every link of every pushing page, as positions in graph.targets
+        counts = graph.out_degree[active]
+        shifts = graph.offsets[active] - np.cumsum(counts) + counts
+        links = np.repeat(shifts, counts) + np.arange(counts.sum())
+        targets = graph.targets[links]
+        # Rank pushed from pages without links is shared by every page
+        shares = d * pushed / np.maximum(counts, 1)
+        np.add.at(residuals, targets, np.repeat(shares, counts))
+        active = np.unique(targets[np.abs(residuals[targets]) > epsilon])
+    return ranks / ranks.sum()
+
+
+def forward_push(graph, damping_factor, seeds, epsilon=PUSH_EPSILON,
+                 estimates=None, residuals=None):
+    """
+    Approximate personalized PageRank, where the surfer teleports (and
+    leaves pages without links) to page numbers in `seeds`, a dictionary
+    mapping each seed to its teleport probability.
+
+    Return (estimates, residuals): dictionaries over the page numbers
+    reached so far. Each page's rank is pushed out until its residual is at
+    most `epsilon` times its number of links, so the work depends on
+    `epsilon` and the seeds' neighbourhood rather than the size of the graph.
+    Every estimate is a lower bound on the true rank, and the true ranks
+    exceed the estimates by sum(residuals) in total. Passing back the
+    returned dictionaries continues the push with a smaller `epsilon`.
+    """
+    d = damping_factor
+    if residuals is None:
+        estimates = dict()
+        residuals = dict(seeds)
+
+    def threshold(page):
+        return epsilon * max(int(graph.out_degree[page]), 1)
+
+    queue = collections.deque(
+        page for page, residual in residuals.items()
+        if residual > threshold(page)
+    )
+    queued = set(queue)
+    while queue:
+        page = queue.popleft()
+        queued.discard(page)
+        residual = residuals[page]
+        estimates[page] = estimates.get(page, 0) + (1 - d) * residual
+        residuals[page] = 0
+        links = graph.links(page).tolist()
+        if links:
+            share = d * residual / len(links)
+            pushes = [(target, share) for target in links]
+        else:
+            pushes = [(seed, d * residual * weight)
+                      for seed, weight in seeds.items()]
+        for target, amount in pushes:
+            residuals[target] = residuals.get(target, 0) + amount
+            if target not in queued and residuals[target] > threshold(target):
+                queue.append(target)
+                queued.add(target)
+    return estimates, residuals
+
+
+def top_k(graph, damping_factor, seeds, k, epsilon=PUSH_EPSILON,
+          min_epsilon=MIN_PUSH_EPSILON, frontier=PUSH_FRONTIER):
+    """
+    Return (ranking, error): the `k` page numbers with the highest
+    personalized PageRank for `seeds` (as in forward_push), as a list of
+    (page, estimate) pairs from highest to lowest, and the bound on how far
+    any estimate may be from its true value.
+
+    The push is continued with `epsilon` shrinking tenfold until the k-th
+    estimate exceeds every other page's estimate plus the error bound, which
+    proves the ranking holds the true top k. Once the push has reached more
+    than `frontier` of the pages (or `epsilon` has reached `min_epsilon`),
+    the ranks are instead found by power_iteration over the whole graph,
+    warm-started from the push.
+    """
+    d = damping_factor
+    estimates, residuals = forward_push(graph, d, seeds, epsilon)
+    while True:
+        error = sum(residuals.values())
+        ranked = heapq.nlargest(k + 1, estimates.items(),
+                                key=lambda item: item[1])
+        runner_up = ranked[k][1] if len(ranked) > k else 0
+        if len(ranked) >= k and ranked[k - 1][1] >= runner_up + error:
+            return ranked[:k], error
+        if len(estimates) > frontier * len(graph) or epsilon <= min_epsilon:
+            break
+        epsilon /= 10
+        estimates, residuals = forward_push(
+            graph, d, seeds, epsilon, estimates, residuals
+        )
+
+    # Pushing reaches too much of the graph to beat iterating over it all
+    teleport = np.zeros(len(graph))
+    teleport[list(seeds)] = list(seeds.values())
+    ranks = np.zeros(len(graph))
+    for values in [estimates, residuals]:
+        np.add.at(ranks, list(values), list(values.values()))
+    ranks = power_iteration(graph, d, ranks, teleport=teleport)
+    best = np.argsort(-ranks, kind="stable")[:k].tolist()
+    ranking = [(page, float(ranks[page])) for page in best]
+
+    # One more iteration would change the ranks by under TOLERANCE, which
+    # bounds their distance from the true ranks by d / (1 - d) times that
+    return ranking, TOLERANCE * d / (1 - d)
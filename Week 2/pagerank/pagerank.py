@@ -1,17 +1,24 @@
-import os
-import random
-import re
 import sys
-import copy
+
+import numpy as np
+
+from crawler import cached_crawl_edges, crawl_edges
+from graph import (
+    PUSH_EPSILON, LinkGraph, forward_push, parallel_surfers, power_iteration,
+    push_update, random_surfer, random_surfers, top_k
+)
 
 DAMPING = 0.85
 SAMPLES = 10000
 
+# Tolerance of the power iteration that sampling errors are measured against
+REFERENCE_TOLERANCE = 1e-12
+
 
 def main():
     if len(sys.argv) != 2:
        sys.exit("Usage: python pagerank.py corpus")
-    corpus = crawl(sys.argv[1])
+    corpus = crawl(sys.argv[1], cache=True)
     ranks = sample_pagerank(corpus, DAMPING, SAMPLES)
     print(f"PageRank Results from Sampling (n = {SAMPLES})")
     for page in sorted(ranks):
@@ -22,31 +29,23 @@ def main():
         print(f"  {page}: {ranks[page]:.4f}")
 
 
-def crawl(directory):
+def crawl(directory, cache=False):
     """
     Parse a directory of HTML pages and check for links to other pages.
     Return a dictionary where each key is a page, and values are
     a list of all other pages in the corpus that are linked to by the page.
-    """
-    pages = dict()
-
-    # Extract all links from HTML files
-    for filename in os.listdir(directory):
-        if not filename.endswith(".html"):
-            continue
-        with open(os.path.join(directory, filename)) as f:
-            contents = f.read()
-            links = re.findall(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"", contents)
-            pages[filename] = set(links) - {filename}
-
-    # Only include links to other pages in the corpus
-    for filename in pages:
-        pages[filename] = set(
-            link for link in pages[filename]
-            if link in pages
-        )
 
-    return pages
+    With `cache`, links parsed by earlier runs are reused for every
+    page that has not changed since.
+    """
+    if cache:
+        pages, sources, targets = cached_crawl_edges(directory)
+    else:
+        pages, sources, targets = crawl_edges(directory)
+    corpus = {page: set() for page in pages}
+    for source, target in zip(sources.tolist(), targets.tolist()):
+        corpus[pages[source]].add(pages[target])
+    return corpus
 
 
 def transition_model(corpus, page, damping_factor):
@@ -84,7 +83,8 @@ def transition_model(corpus, page, damping_factor):
     #raise NotImplementedError
 
 
-def sample_pagerank(corpus, damping_factor, n):
+def sample_pagerank(corpus, damping_factor, n, walkers=1, seed=None,
+                    processes=1, report=None):
     """
     Return PageRank values for each page by sampling `n` pages
     according to transition model, starting with a page at random.
@@ -92,35 +92,41 @@ def sample_pagerank(corpus, damping_factor, n):
     Return a dictionary where keys are page names, and values are
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
+
+    With `walkers` greater than 1, the samples are drawn by that many
+    independent surfers advanced together with NumPy. With `processes`
+    greater than 1 (or None, for every CPU), the samples are split over
+    worker processes with independent random streams.
+
+    If `report` is a ConvergenceReport, the L1 error of the estimate against
+    its reference (by default, ranks from power iteration) is recorded after
+    every power of two samples; with several processes, only at the end.
     """
-    #corpus = dictionary that maps page name to set of all pages linked to by that page
-    #n = integer representing number of samples generated to estimate pagerank values
-    #create return dictionary:
-    returnDict = dict.fromkeys(corpus.keys(), 0)
-    #each key maps to a value representing that page's pageRank
-    #first sample from choosing from a page at random:
-    firstSample = random.choices(list(corpus.keys()), k = 1)[0]
-    #increment first sample
-    returnDict[firstSample] += 1
-    #get transition probabilities:
-    transitionProb = transition_model(corpus, firstSample, damping_factor)
-    #iterate through the rest of n!
-    for i in range(n-1):
-        #get the new sample using random and weights from transition probabilities
-        sample = random.choices(list(transitionProb.keys()), k = 1, weights = list(transitionProb.values()))[0]
-        returnDict[sample] += 1
-        transitionProb = transition_model(corpus, sample, damping_factor)
-    
-    #calculate page rank by iterating over dictionaries and altering keys
-    for key in returnDict:
-        num = returnDict[key]
-        returnDict[key] = num / n
-    
-    return returnDict
-    #raise NotImplementedError
+    #each step picks a link by offset into the graph's link arrays
+    #instead of building the whole transition model
+    graph = LinkGraph.from_corpus(corpus)
+    if report is not None and report.reference is None:
+        report.reference = power_iteration(
+            graph, damping_factor, tolerance=REFERENCE_TOLERANCE
+        )
+    if processes != 1:
+        if report is not None:
+            report.begin()
+        counts = parallel_surfers(
+            graph, damping_factor, n, walkers, seed, processes
+        )
+        if report is not None:
+            report.record_samples(n, counts)
+    elif walkers == 1:
+        counts = random_surfer(graph, damping_factor, n, seed, report)
+    else:
+        counts = random_surfers(
+            graph, damping_factor, n, walkers, seed, report
+        )
+    return graph.to_dict(counts / n)
 
 
-def iterate_pagerank(corpus, damping_factor):
+def iterate_pagerank(corpus, damping_factor, report=None):
     """
     Return PageRank values for each page by iteratively updating
     PageRank values until convergence.
@@ -128,48 +134,77 @@ def iterate_pagerank(corpus, damping_factor):
     Return a dictionary where keys are page names, and values are
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
+
+    If `report` is a ConvergenceReport, the L1 residual and elapsed
+    time of every iteration are recorded in it.
     """
-    #create return Dict
-    returnDict = dict.fromkeys(corpus.keys(), 1.0/len(corpus))
-
-    #in following formula, there's a constant in each page's rank
-    baseRank = (1 - damping_factor) / len(corpus)
-    for key in corpus:
-        returnDict[key] = baseRank
-
-    #copy corpus and modify so it fits specification:
-    corpusCopy = copy.deepcopy(corpus)
-    for key in corpusCopy:
-        if (len(corpusCopy[key]) == 0):
-            corpusCopy[key] = set(corpusCopy.keys())
-
-    #create change transition var:
-    threshold = True
-    #iterate while threshold holds!
-    while threshold:
-        #use our prior distribution to ensure changes are above threshold!
-        priorDistribution = copy.deepcopy(returnDict)
-        for page in corpus:
-            #link weight
-            linkW = 0
-            #summation portion of formula translated
-            for pageCheck in corpus:
-                if(page in corpus[pageCheck]):
-                    linkW += returnDict[pageCheck] / len(corpus[pageCheck])
-            #add summation to return:)
-
-            returnDict[page] = (damping_factor * linkW) + baseRank
-            #once changes are precise, set threshold to false!
-            threshold = (abs(priorDistribution[page] - returnDict[page]) > 0.0001)
-
-    #check to verify code!
-    total = 0
-    for page in returnDict:
-        total += returnDict[page]
-    #print("should be 1: ", total)     
-    
-    return returnDict
-    #raise NotImplementedError
+    #build the link matrix once and let power iteration do the updates
+    graph = LinkGraph.from_corpus(corpus)
+    return graph.to_dict(
+        power_iteration(graph, damping_factor, report=report)
+    )
+
+
+def update_pagerank(corpus, old_ranks, damping_factor, graph=None):
+    """
+    Return PageRank values for each page of `corpus`, given the PageRank
+    values `old_ranks` already computed for an earlier crawl of the same
+    pages. Only the pages around those whose links changed are revisited,
+    so small edits converge quickly. Pass the LinkGraph of `corpus` as
+    `graph` if it is already built.
+
+    Return a dictionary where keys are page names, and values are
+    their estimated PageRank value (a value between 0 and 1). All
+    PageRank values should sum to 1.
+    """
+    if graph is None:
+        graph = LinkGraph.from_corpus(corpus)
+    ranks = np.array([old_ranks.get(page, 0) for page in graph.pages])
+    return graph.to_dict(push_update(graph, ranks, damping_factor))
+
+
+def personalized_pagerank(corpus, damping_factor, seeds, epsilon=PUSH_EPSILON):
+    """
+    Return (ranks, error): approximate PageRank values for each page when
+    the random surfer teleports to `seeds` (a collection of pages, chosen
+    uniformly, or a dictionary mapping pages to teleport probabilities)
+    instead of to any page in the corpus.
+
+    Each value in `ranks` is at most `error` below the true value, and the
+    values sum to 1 - `error`. Smaller `epsilon` lowers the error at the
+    cost of exploring more of the corpus around the seeds.
+    """
+    graph = LinkGraph.from_corpus(corpus)
+    estimates, residuals = forward_push(
+        graph, damping_factor, seed_weights(graph, seeds), epsilon
+    )
+    ranks = dict.fromkeys(graph.pages, 0.0)
+    for page, value in estimates.items():
+        ranks[graph.pages[page]] = value
+    return ranks, sum(residuals.values())
+
+
+def top_pages(corpus, damping_factor, seeds, k):
+    """
+    Return the `k` pages with the highest PageRank when teleporting to
+    `seeds` (as in personalized_pagerank), as a list of (page, rank) pairs
+    from highest to lowest. Only the pages near the seeds are explored,
+    just far enough to be sure of which pages make the top k.
+    """
+    graph = LinkGraph.from_corpus(corpus)
+    ranking, _ = top_k(graph, damping_factor, seed_weights(graph, seeds), k)
+    return [(graph.pages[page], value) for page, value in ranking]
+
+
+def seed_weights(graph, seeds):
+    """
+    Return a dictionary mapping the page numbers of `seeds` in `graph` to
+    their teleport probabilities, normalized to sum to 1.
+    """
+    if not isinstance(seeds, dict):
+        seeds = dict.fromkeys(seeds, 1)
+    total = sum(seeds.values())
+    return {graph.index[page]: weight / total for page, weight in seeds.items()}
 
 
 if __name__ == "__main__":
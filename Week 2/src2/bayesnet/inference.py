@@ -11,5 +11,5 @@ for node, prediction in zip(model.states, predictions):
         print(f"{node.name}: {prediction}")
     else:
         print(f"{node.name}")
-        for value, probability in prediction.parameters[0].items():
+        for value, probability in prediction.items():
             print(f"    {value}: {probability:.4f}")
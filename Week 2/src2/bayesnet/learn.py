@@ -0,0 +1,25 @@
+import itertools
+import sys
+
+from model import model
+
+# Estimate every table of the network in model.py from a CSV file with a
+# column of observed values for each node
+if len(sys.argv) != 2:
+    sys.exit("Usage: python learn.py data.csv")
+model.fit_csv(sys.argv[1])
+
+# Print each node's distribution for every combination of parent values
+for node in model.states:
+    distribution = node.distribution
+    print(node.name)
+    rows = distribution.table.reshape(-1, len(distribution.values))
+    parents = [parent.values for parent in distribution.parents]
+    for given, row in zip(itertools.product(*parents), rows):
+        probabilities = ", ".join(
+            f"{value}: {p:.4f}" for value, p in zip(distribution.values, row)
+        )
+        if given:
+            print(f"    given {', '.join(given)}: {probabilities}")
+        else:
+            print(f"    {probabilities}")
@@ -1,6 +1,6 @@
 from model import model
 
 # Calculate probability for a given observation
-probability = model.probability([["none", "no", "on time", "attend"]])
+probability = model.probability([["none", "no", "on time", "attend"]])[0]
 
 print(probability)
@@ -1,4 +1,6 @@
-from pomegranate import *
+from network import (
+    BayesianNetwork, ConditionalProbabilityTable, DiscreteDistribution, Node
+)
 
 # Rain node has no parents
 rain = Node(DiscreteDistribution({
@@ -0,0 +1,439 @@
+import csv
+import functools
+import itertools
+
+import numpy as np
+
+# Compiled queries kept by each network, least recently used evicted first
+QUERY_CACHE_SIZE = 128
+
+# Count added to every table entry when learning from data
+PSEUDOCOUNT = 1
+
+# Rows of a CSV file read at a time when learning from it
+CHUNK_ROWS = 100000
+
+
+class DiscreteDistribution():
+    """
+    A distribution over the values of a node without parents, given as a
+    dictionary mapping each value to its probability.
+    """
+
+    def __init__(self, probabilities):
+        self.values = list(probabilities)
+        self.parents = []
+        self.table = np.array(
+            [probabilities[value] for value in self.values], dtype=float
+        )
+
+
+class ConditionalProbabilityTable():
+    """
+    A distribution over the values of a node given the values of its
+    `parents`, a list of the distributions of other nodes. Each row lists
+    a value of every parent, in order, then a value of the node and its
+    probability. The table is stored as an array indexed by the position
+    of each parent's value, then the position of the node's value.
+    """
+
+    def __init__(self, rows, parents):
+        self.parents = list(parents)
+        self.values = []
+        for row in rows:
+            if row[-2] not in self.values:
+                self.values.append(row[-2])
+        self.table = np.zeros(
+            [len(parent.values) for parent in self.parents] + [len(self.values)]
+        )
+        for row in rows:
+            position = tuple(
+                parent.values.index(value)
+                for parent, value in zip(self.parents, row[:-2])
+            ) + (self.values.index(row[-2]),)
+            self.table[position] = row[-1]
+
+
+class Node():
+    """
+    A named random variable with its distribution.
+    """
+
+    def __init__(self, distribution, name):
+        self.distribution = distribution
+        self.name = name
+
+
+class BayesianNetwork():
+    """
+    A Bayesian network over discrete nodes. Add states and edges, then call
+    bake before asking any queries.
+
+    Every node's table becomes a factor, a pair (scope, array) where scope
+    is a tuple of node numbers (positions in `states`) naming the array's
+    axes in order. Queries are answered by variable elimination, compiled
+    once for each combination of query and evidence nodes (see compile).
+    """
+
+    def __init__(self):
+        self.states = []
+        self.edges = []
+
+    def add_states(self, *states):
+        self.states.extend(states)
+
+    def add_edge(self, parent, child):
+        self.edges.append((parent, child))
+
+    def bake(self):
+        """
+        Number the nodes, check that the edges match the parents of each
+        node's table, and build the factors.
+        """
+        owner = {
+            id(state.distribution): i for i, state in enumerate(self.states)
+        }
+        self.index = {state.name: i for i, state in enumerate(self.states)}
+        self.parents = [
+            [owner[id(parent)] for parent in state.distribution.parents]
+            for state in self.states
+        ]
+        edges = {
+            (self.states.index(parent), self.states.index(child))
+            for parent, child in self.edges
+        }
+        if edges != {
+            (parent, child)
+            for child, parents in enumerate(self.parents)
+            for parent in parents
+        }:
+            raise ValueError("edges do not match the conditional tables")
+
+        self.values = [state.distribution.values for state in self.states]
+        self.positions = [
+            {value: j for j, value in enumerate(values)}
+            for values in self.values
+        ]
+        self.factors = [
+            (tuple(self.parents[i]) + (i,), state.distribution.table)
+            for i, state in enumerate(self.states)
+        ]
+
+        # Tables flattened to one row per combination of parent values,
+        # and their cumulative sums for sampling by inverse transform
+        self.rows = [
+            table.reshape(-1, len(self.values[i]))
+            for i, (_, table) in enumerate(self.factors)
+        ]
+        self.cumulative = [
+            np.ascontiguousarray(rows.cumsum(axis=1)[:, :-1].T)
+            for rows in self.rows
+        ]
+
+        # A fresh cache, since compiled queries depend on the tables
+        self.compile = functools.lru_cache(maxsize=QUERY_CACHE_SIZE)(
+            self.compile_query
+        )
+
+        # Parents come before their children in the sampling order
+        self.order = []
+        while len(self.order) < len(self.states):
+            for i, parents in enumerate(self.parents):
+                if i not in self.order and all(
+                    parent in self.order for parent in parents
+                ):
+                    self.order.append(i)
+
+    def observe(self, evidence):
+        """
+        Return a dictionary mapping the node number of each name in
+        `evidence` to the position of its observed value.
+        """
+        return {
+            self.index[name]: self.positions[self.index[name]][value]
+            for name, value in evidence.items()
+        }
+
+    def predict_proba(self, evidence):
+        """
+        Return, for every state in order, its value if it is observed in
+        `evidence` (a dictionary mapping names to values), or else a
+        dictionary mapping each of its values to its probability given
+        the evidence.
+        """
+        names = tuple(sorted(evidence))
+        row = [[evidence[name] for name in names]]
+        predictions = []
+        for i, state in enumerate(self.states):
+            if state.name in evidence:
+                predictions.append(evidence[state.name])
+                continue
+            distribution = self.posteriors((state.name,), names, row)[0]
+            predictions.append(dict(zip(self.values[i], distribution.tolist())))
+        return predictions
+
+    def posteriors(self, query, evidence, rows):
+        """
+        Return an array of the joint distributions of the `query` nodes
+        (a tuple of names) given each of `rows`, a list of values of the
+        `evidence` nodes (a tuple of names, in the same order). Row i of the
+        result is indexed by the position of each query node's value.
+        """
+        positions = np.array([
+            [self.positions[self.index[name]][value]
+             for name, value in zip(evidence, row)]
+            for row in rows
+        ], dtype=np.int64).reshape(len(rows), len(evidence))
+        return self.compile(tuple(query), tuple(evidence)).posteriors(positions)
+
+    def compile_query(self, query, evidence):
+        """
+        Return a CompiledQuery for the `query` and `evidence` nodes (tuples
+        of names), summing out every other node by variable elimination
+        in min-fill order. Called through compile, which caches the result.
+        """
+        query = tuple(self.index[name] for name in query)
+        evidence = tuple(self.index[name] for name in evidence)
+        factors = self.factors
+        for variable in elimination_order(
+            [scope for scope, _ in factors], set(query + evidence)
+        ):
+            factors = eliminate(factors, variable)
+        return CompiledQuery(
+            query, evidence, multiply(factors, query + evidence)
+        )
+
+    def sample(self, n, seed=None):
+        """
+        Return `n` samples drawn from the network, as a dictionary
+        mapping each name to an array of the sampled values.
+        """
+        positions, _ = self.forward(n, {}, np.random.default_rng(seed))
+        return self.decode(positions)
+
+    def likelihood_weighting(self, evidence, n, seed=None):
+        """
+        Return, in the format of predict_proba, distributions given
+        `evidence` estimated from `n` samples. Observed nodes are fixed to
+        their values rather than sampled, and each sample is weighted by
+        the probability of the evidence given its other values, so no
+        sample is rejected however unlikely the evidence.
+        """
+        observed = self.observe(evidence)
+        positions, weights = self.forward(
+            n, observed, np.random.default_rng(seed)
+        )
+        total = weights.sum()
+        predictions = []
+        for i, state in enumerate(self.states):
+            if i in observed:
+                predictions.append(evidence[state.name])
+                continue
+            counts = np.bincount(
+                positions[:, i], weights, minlength=len(self.values[i])
+            )
+            predictions.append(
+                dict(zip(self.values[i], (counts / total).tolist()))
+            )
+        return predictions
+
+    def forward(self, n, observed, rng):
+        """
+        Draw `n` samples at once, node by node with parents first, fixing
+        the nodes in `observed` (as returned by observe). Return an n x nodes
+        array of value positions and the array of each sample's weight.
+        """
+        columns = [None] * len(self.states)
+        weights = np.ones(n)
+        for i in self.order:
+            # Number each sample's combination of parent values, which is
+            # its row in the flattened table
+            row = np.zeros(n, dtype=np.int64)
+            for parent in self.parents[i]:
+                row *= len(self.values[parent])
+                row += columns[parent]
+
+            if i in observed:
+                columns[i] = np.full(n, observed[i], dtype=np.int64)
+                weights *= self.rows[i][:, observed[i]][row]
+                continue
+            draws = rng.random(n)
+            columns[i] = np.zeros(n, dtype=np.int64)
+            for threshold in self.cumulative[i]:
+                columns[i] += draws >= threshold[row]
+        return np.column_stack(columns), weights
+
+    def decode(self, positions):
+        """
+        Return a dictionary mapping each name to an array of the values
+        at `positions`, an array with one column for every state.
+        """
+        return {
+            state.name: np.array(self.values[i])[positions[:, i]]
+            for i, state in enumerate(self.states)
+        }
+
+    def probability(self, rows):
+        """
+        Return an array of the joint probabilities of `rows`, each a list
+        of one value for every state, in order.
+        """
+        positions = np.array([
+            [self.positions[i][value] for i, value in enumerate(row)]
+            for row in rows
+        ], dtype=np.int64).reshape(-1, len(self.states))
+        probabilities = np.ones(len(positions))
+        for scope, table in self.factors:
+            probabilities *= table[tuple(positions[:, scope].T)]
+        return probabilities
+
+    def fit(self, rows, pseudocount=PSEUDOCOUNT):
+        """
+        Set every table to its maximum likelihood estimate from `rows`, each
+        a list of one value for every state, in order. `pseudocount` is
+        added to every count first (Laplace smoothing), so combinations
+        missing from the data keep some probability.
+        """
+        counts = [np.zeros(table.size) for _, table in self.factors]
+        self.count(counts, rows, range(len(self.states)))
+        self.set_counts(counts, pseudocount)
+
+    def fit_csv(self, filename, pseudocount=PSEUDOCOUNT,
+                chunk_rows=CHUNK_ROWS):
+        """
+        As fit, but from a CSV file with a header naming every state (in any
+        order) and one value per column, read `chunk_rows` rows at a time
+        so that memory stays bounded however large the file.
+        """
+        counts = [np.zeros(table.size) for _, table in self.factors]
+        with open(filename) as f:
+            reader = csv.reader(f)
+            header = next(reader)
+            columns = [header.index(state.name) for state in self.states]
+            while True:
+                chunk = list(itertools.islice(reader, chunk_rows))
+                if not chunk:
+                    break
+                self.count(counts, chunk, columns)
+        self.set_counts(counts, pseudocount)
+
+    def count(self, counts, rows, columns):
+        """
+        Add to `counts` (one flat array per factor) how often each
+        combination of a node's parents' values and its own value occurs in
+        `rows`, where node i's value is in column columns[i] of each row.
+        """
+        positions = [
+            np.fromiter(
+                map(self.positions[i].__getitem__,
+                    (row[column] for row in rows)),
+                dtype=np.int64, count=len(rows)
+            )
+            for i, column in enumerate(columns)
+        ]
+        for i, (scope, table) in enumerate(self.factors):
+            entry = np.zeros(len(rows), dtype=np.int64)
+            for node in scope:
+                entry *= len(self.values[node])
+                entry += positions[node]
+            counts[i] += np.bincount(entry, minlength=table.size)
+
+    def set_counts(self, counts, pseudocount):
+        """
+        Replace every table with its smoothed, normalized `counts`,
+        then bake the network again.
+        """
+        for i, state in enumerate(self.states):
+            table = counts[i].reshape(self.factors[i][1].shape) + pseudocount
+            state.distribution.table = table / table.sum(
+                axis=-1, keepdims=True
+            )
+        self.bake()
+
+
+class CompiledQuery():
+    """
+    The joint distribution of some query and evidence nodes, with every
+    other node of the network summed out. The table's axes are the query
+    nodes, then the evidence nodes, so the posterior for any evidence
+    values is a lookup followed by normalization.
+    """
+
+    def __init__(self, query, evidence, table):
+        self.query = query
+        self.evidence = evidence
+        self.table = table
+
+    def posteriors(self, positions):
+        """
+        Return the posterior of the query nodes for each row of `positions`,
+        an array holding the position of every evidence node's value, as an
+        array with one row per evidence row and one axis per query node.
+        """
+        selected = self.table[
+            (slice(None),) * len(self.query) + tuple(positions.T)
+        ]
+        selected = np.moveaxis(selected, -1, 0) if self.evidence else (
+            np.broadcast_to(selected, (len(positions),) + selected.shape)
+        )
+        axes = tuple(range(1, selected.ndim))
+        return selected / selected.sum(axis=axes, keepdims=True)
+
+
+def multiply(factors, scope):
+    """
+    Return the array over `scope` of the product of `factors`,
+    summing out every other variable in their scopes.
+    """
+    operands = itertools.chain.from_iterable(
+        (table, list(factor_scope)) for factor_scope, table in factors
+    )
+    return np.einsum(*operands, list(scope))
+
+
+def eliminate(factors, variable):
+    """
+    Return `factors` with those mentioning `variable` replaced by
+    their product with `variable` summed out.
+    """
+    involved = [factor for factor in factors if variable in factor[0]]
+    rest = [factor for factor in factors if variable not in factor[0]]
+    scope = tuple(sorted(
+        {name for factor_scope, _ in involved for name in factor_scope}
+        - {variable}
+    ))
+    return rest + [(scope, multiply(involved, scope))]
+
+
+def elimination_order(scopes, keep):
+    """
+    Return an order in which to eliminate every variable in `scopes`
+    except those in `keep`, greedily picking the variable whose elimination
+    adds the fewest edges between its remaining neighbors (min-fill).
+    """
+    neighbors = dict()
+    for scope in scopes:
+        for variable in scope:
+            neighbors.setdefault(variable, set()).update(scope)
+            neighbors[variable].discard(variable)
+
+    def fill(variable):
+        return sum(
+            1 for a, b in itertools.combinations(neighbors[variable], 2)
+            if b not in neighbors[a]
+        )
+
+    order = []
+    remaining = set(neighbors) - set(keep)
+    while remaining:
+        variable = min(
+            remaining,
+            key=lambda v: (fill(v), len(neighbors[v]), v)
+        )
+        order.append(variable)
+        remaining.discard(variable)
+        adjacent = neighbors.pop(variable)
+        for name in adjacent:
+            neighbors[name].discard(variable)
+            neighbors[name] |= adjacent - {name}
+    return order
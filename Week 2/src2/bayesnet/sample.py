@@ -1,47 +1,21 @@
-import pomegranate
-
 from collections import Counter
 
 from model import model
 
-def generate_sample():
-
-    # Mapping of random variable name to sample generated
-    sample = {}
-
-    # Mapping of distribution to sample generated
-    parents = {}
-
-    # Loop over all states, assuming topological order
-    for state in model.states:
-
-        # If we have a non-root node, sample conditional on parents
-        if isinstance(state.distribution, pomegranate.ConditionalProbabilityTable):
-            sample[state.name] = state.distribution.sample(parent_values=parents)
-
-        # Otherwise, just sample from the distribution alone
-        else:
-            sample[state.name] = state.distribution.sample()
-
-        # Keep track of the sampled value in the parents mapping
-        parents[state.distribution] = sample[state.name]
-
-    # Return generated sample
-    return sample
-
 # Rejection sampling
-# Compute distribution of Appointment given that train is delayed
+# Compute distribution of Appointment given that train is delayed,
+# drawing every sample at once and keeping those where train is delayed
 N = 10000
-data = []
-for i in range(N):
-    sample = generate_sample()
-    if sample["train"] == "delayed":
-        data.append(sample["appointment"])
-print(Counter(data))
-
-
-
-
-
-
-
+samples = model.sample(N)
+data = samples["appointment"][samples["train"] == "delayed"]
+print(Counter(data.tolist()))
+
+# Likelihood weighting
+# Fix train to delayed and weight each sample by how likely that is,
+# so no sample is discarded
+for node, prediction in zip(
+    model.states, model.likelihood_weighting({"train": "delayed"}, N)
+):
+    if node.name == "appointment":
+        for value, probability in prediction.items():
+            print(f"{value}: {probability:.4f}")
@@ -0,0 +1,105 @@
+import math
+
+import numpy as np
+
+
+class MarkovChain():
+    """
+    A Markov chain over named states, given the probabilities of starting
+    in each state and rows [today, tomorrow, probability] of its transition
+    table. Transitions are stored as a states x states matrix, with the
+    cumulative sum of each row precomputed for sampling.
+    """
+
+    def __init__(self, start, transitions):
+        self.states = list(start)
+        self.index = {state: i for i, state in enumerate(self.states)}
+        self.starts = np.array([start[state] for state in self.states])
+        self.transitions = np.zeros((len(self.states), len(self.states)))
+        for today, tomorrow, probability in transitions:
+            row, column = self.index[today], self.index[tomorrow]
+            self.transitions[row, column] = probability
+
+        # A uniform draw u picks the number of cumulative thresholds <= u
+        self.start_thresholds = self.starts.cumsum()[:-1]
+        self.thresholds = self.transitions.cumsum(axis=1)[:, :-1]
+
+    def sample(self, length, seed=None):
+        """
+        Return a list of `length` state names sampled from the chain.
+        """
+        chains = self.sample_chains(length, 1, seed)
+        return [self.states[i] for i in chains[0].tolist()]
+
+    def sample_chains(self, length, chains, seed=None, block=None):
+        """
+        Return a chains x length array of state numbers from `chains`
+        independent runs of the chain.
+
+        Each step's uniform draw turns the transition table into a map from
+        today's state to tomorrow's. Steps are split into blocks of `block`
+        steps (by default, about the square root of `length`) handled side
+        by side: each block's maps are composed in parallel, only the states
+        at block boundaries are found one block after another, and then
+        every block is filled in at once. The random generator is rewound to
+        replay the same draws for the second pass, so memory is just the
+        output.
+        """
+        rng = np.random.default_rng(seed)
+        samples = np.zeros(
+            (chains, length), dtype=np.min_scalar_type(len(self.states) - 1)
+        )
+        if length == 0:
+            return samples
+        first = np.searchsorted(
+            self.start_thresholds, rng.random(chains), side="right"
+        )
+        k = block or max(1, math.isqrt(length - 1))
+        blocks = len(range(1, length, k))
+        identity = np.arange(len(self.states))
+
+        def maps():
+            """
+            Yield the maps of each offset into every block, as a
+            chains x blocks x states array of tomorrow's state numbers.
+            """
+            for _ in range(k):
+                draws = rng.random((chains, blocks, 1, 1))
+                yield (draws >= self.thresholds).sum(axis=3)
+
+        # Compose each block's maps, replaying the draws afterwards
+        state = rng.bit_generator.state
+        composed = np.broadcast_to(identity, (chains, blocks, len(identity)))
+        for step in maps():
+            composed = np.take_along_axis(step, composed, axis=2)
+        rng.bit_generator.state = state
+
+        # States at the start of every block, block by block
+        starts = np.zeros((chains, blocks), dtype=np.int64)
+        current = first
+        for j in range(blocks):
+            starts[:, j] = current
+            current = composed[np.arange(chains), j, current]
+
+        # Fill in every block at once; steps past the end are dropped
+        filled = np.zeros((chains, blocks, k), dtype=samples.dtype)
+        current = starts
+        for offset, step in enumerate(maps()):
+            current = np.take_along_axis(step, current[:, :, None], axis=2)[
+                :, :, 0
+            ]
+            filled[:, :, offset] = current
+        samples[:, 0] = first
+        samples[:, 1:] = filled.reshape(chains, -1)[:, :length - 1]
+        return samples
+
+    def stationary(self):
+        """
+        Return a dictionary mapping each state to its long-run probability:
+        the eigenvector of the transposed transition matrix with eigenvalue
+        1, scaled to sum to 1. For a chain with several such distributions
+        (one that is not irreducible), one of them is returned.
+        """
+        values, vectors = np.linalg.eig(self.transitions.T)
+        vector = np.real(vectors[:, np.argmin(np.abs(values - 1))])
+        return dict(zip(self.states, (vector / vector.sum()).tolist()))
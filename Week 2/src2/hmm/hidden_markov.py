@@ -0,0 +1,621 @@
+import csv
+import itertools
+import math
+import os
+import tempfile
+
+import numpy as np
+
+# Steps a StreamingFilter waits for before finalizing a step's estimates
+LAG = 10
+
+# Baum-Welch stops after this many iterations, or once the log
+# likelihood of the data improves by less than FIT_TOLERANCE
+ITERATIONS = 100
+FIT_TOLERANCE = 1e-4
+
+# Expected count added to every probability when fitting
+PSEUDOCOUNT = 0.1
+
+# Observations of a CSV file read at a time when fitting to it
+CHUNK_ROWS = 100000
+
+
+class HiddenMarkovModel():
+    """
+    A hidden Markov model over discrete states and observations, with every
+    probability stored as a logarithm so long sequences never underflow.
+
+    Methods accept a batch of sequences at once: either a list of sequences
+    of observations (of any lengths), or a 2D array of observation numbers
+    padded to a common length together with each sequence's length.
+    """
+
+    def __init__(self, transitions, emissions, starts, states, symbols):
+        """
+        Build a model from a states x states matrix of `transitions`
+        (row: today, column: tomorrow), a states x symbols matrix of
+        `emissions`, the probabilities of starting in each state, and the
+        names of the states and of the observed symbols.
+        """
+        self.states = list(states)
+        self.symbols = list(symbols)
+        self.index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        with np.errstate(divide="ignore"):
+            self.log_transitions = np.log(np.asarray(transitions, dtype=float))
+            self.log_emissions = np.log(np.asarray(emissions, dtype=float))
+            self.log_starts = np.log(np.asarray(starts, dtype=float))
+
+    @classmethod
+    def from_matrix(cls, transitions, distributions, starts, state_names):
+        """
+        Build a model from a matrix of `transitions`, a dictionary for each
+        state mapping every observation to its probability, the starting
+        probabilities and the names of the states.
+        """
+        symbols = []
+        for distribution in distributions:
+            for symbol in distribution:
+                if symbol not in symbols:
+                    symbols.append(symbol)
+        emissions = [
+            [distribution.get(symbol, 0) for symbol in symbols]
+            for distribution in distributions
+        ]
+        return cls(transitions, emissions, starts, state_names, symbols)
+
+    def pad(self, sequences, lengths=None):
+        """
+        Return (observations, lengths): `sequences` as a 2D array of
+        observation numbers, one padded row per sequence, and the array of
+        sequence lengths. A 2D array is taken to hold observation numbers
+        already, with every row full length unless `lengths` are given.
+        """
+        if isinstance(sequences, np.ndarray):
+            observations = np.atleast_2d(sequences).astype(np.int64)
+            if lengths is None:
+                lengths = np.full(len(observations), observations.shape[1])
+            return observations, np.asarray(lengths, dtype=np.int64)
+
+        lengths = np.array([len(sequence) for sequence in sequences],
+                           dtype=np.int64)
+        observations = np.zeros((len(sequences), lengths.max(initial=0)),
+                                dtype=np.int64)
+        for row, sequence in zip(observations, sequences):
+            if isinstance(sequence, np.ndarray):
+                row[:len(sequence)] = sequence
+            else:
+                row[:len(sequence)] = [
+                    self.index[symbol] for symbol in sequence
+                ]
+        return observations, lengths
+
+    def transfer(self, observations, lengths, k, offset):
+        """
+        Return, for the step `offset` steps into every segment of `k` steps
+        (segment j starting at step 1 + j * k), a batch x segments x states x
+        states array whose entry [b, j, i, s] is the log probability of
+        moving from state i to state s and then making sequence b's
+        observation. Steps past the end of a sequence are identity matrices
+        (0 on the diagonal, -inf elsewhere), so they change nothing.
+        """
+        steps = observations.shape[1]
+        times = np.arange(1, steps, k) + offset
+        emissions = self.log_emissions.T[
+            observations[:, np.minimum(times, steps - 1)]
+        ]
+        matrices = self.log_transitions + emissions[:, :, None, :]
+        valid = times < lengths[:, None]
+        with np.errstate(divide="ignore"):
+            identity = np.log(np.eye(len(self.states)))
+        return np.where(valid[:, :, None, None], matrices, identity)
+
+    def predict(self, observations, algorithm="map"):
+        """
+        Return a list of state numbers for a single sequence of
+        `observations`: with algorithm "map", the most likely state at each
+        step given the whole sequence (from forward_backward), or with
+        "viterbi", the states of the most likely path as a whole.
+        """
+        if algorithm == "viterbi":
+            paths, _ = self.viterbi([observations])
+            return paths[0].tolist()
+        if algorithm == "map":
+            posteriors, _ = self.forward_backward([observations])
+            return posteriors[0].argmax(axis=1).tolist()
+        raise ValueError(f"unknown algorithm {algorithm}")
+
+    def viterbi(self, sequences, lengths=None, checkpoint=None):
+        """
+        Return (paths, log_probabilities): the most likely sequence of state
+        numbers for each of `sequences` (see pad), and the log probability
+        of each path together with its observations.
+
+        Steps are split into segments of `checkpoint` steps (by default, the
+        square root of the longest sequence), processed side by side: each
+        segment's best-score transfer matrix is built in parallel, only the
+        scores at segment boundaries are carried from one segment to the
+        next, and back pointers are then found within every segment at once.
+        Memory stays linear in the total length of the sequences.
+        """
+        observations, lengths = self.pad(sequences, lengths)
+        batch, steps = observations.shape
+        if steps == 0:
+            return [np.zeros(0, dtype=np.int64)] * batch, np.zeros(batch)
+        n = len(self.states)
+        k = checkpoint or max(1, math.isqrt(steps - 1))
+        segments = len(range(1, steps, k))
+        rows = np.arange(batch)[:, None]
+        columns = np.arange(segments)
+
+        # Best-score transfer matrix of each segment
+        transfers = None
+        for offset in range(k):
+            step = self.transfer(observations, lengths, k, offset)
+            transfers = step if transfers is None else max_matmul(
+                transfers, step
+            )
+
+        # Scores at the start of every segment, carried segment by segment;
+        # an empty sequence has probability 1, whatever its padding holds
+        scores = np.where(
+            (lengths == 0)[:, None], 0,
+            self.log_starts + self.log_emissions.T[observations[:, 0]]
+        )
+        boundaries = np.zeros((batch, segments, n))
+        for j in range(segments):
+            boundaries[:, j] = scores
+            scores = max_matmul(scores[:, None, :], transfers[:, j])[:, 0]
+        state = scores.argmax(axis=1)
+        log_probabilities = scores[rows[:, 0], state]
+
+        # Back pointers within every segment at once
+        pointers = np.zeros((batch, segments, k, n),
+                            dtype=np.min_scalar_type(n - 1))
+        scores = boundaries
+        for offset in range(k):
+            candidates = (scores[:, :, :, None] +
+                          self.transfer(observations, lengths, k, offset))
+            pointers[:, :, offset] = candidates.argmax(axis=2)
+            scores = candidates.max(axis=2)
+
+        # For each segment and each state it might end in, the state it
+        # starts from; then the actual end states, last segment first
+        origins = np.broadcast_to(np.arange(n), (batch, segments, n))
+        for offset in reversed(range(k)):
+            origins = np.take_along_axis(pointers[:, :, offset], origins, 2)
+        ends = np.zeros((batch, segments), dtype=np.int64)
+        for j in reversed(range(segments)):
+            ends[:, j] = state
+            state = origins[rows[:, 0], j, state]
+
+        # Trace every segment back from its end state
+        paths = np.zeros((batch, segments, k), dtype=np.int64)
+        current = ends
+        for offset in reversed(range(k)):
+            paths[:, :, offset] = current
+            current = pointers[rows, columns, offset, current]
+        paths = np.concatenate(
+            [state[:, None], paths.reshape(batch, -1)[:, :steps - 1]], axis=1
+        )
+        return (
+            [path[:length] for path, length in zip(paths, lengths)],
+            log_probabilities
+        )
+
+    def forward_backward(self, sequences, lengths=None, checkpoint=None):
+        """
+        Return (posteriors, log_likelihoods): for each of `sequences` (see
+        pad), an array of the probability of every state at every step given
+        the whole sequence, and the log likelihood of the sequence.
+
+        As in viterbi, segments of `checkpoint` steps are processed side by
+        side: forward and backward messages are carried only across segment
+        boundaries, then filled in within every segment at once.
+        """
+        observations, lengths = self.pad(sequences, lengths)
+        posteriors, log_likelihoods, _ = self.smooth(
+            observations, lengths, checkpoint
+        )
+        return (
+            [posterior[:length] for posterior, length
+             in zip(posteriors, lengths)],
+            log_likelihoods
+        )
+
+    def smooth(self, observations, lengths, checkpoint=None):
+        """
+        Run forward-backward over padded `observations` with `lengths`.
+        Return (posteriors, log_likelihoods, transitions): a batch x steps x
+        states array of posteriors, the log likelihood of each sequence, and
+        the expected number of transitions from each state to each other
+        summed over the batch.
+        """
+        batch, steps = observations.shape
+        n = len(self.states)
+        if steps == 0:
+            return np.zeros((batch, 0, n)), np.zeros(batch), np.zeros((n, n))
+        k = checkpoint or max(1, math.isqrt(steps - 1))
+        segments = len(range(1, steps, k))
+
+        # Transfer matrix of each segment
+        transfers = None
+        for offset in range(k):
+            step = self.transfer(observations, lengths, k, offset)
+            transfers = step if transfers is None else log_matmul(
+                transfers, step
+            )
+
+        # Forward messages at the start of every segment; an empty sequence
+        # has probability 1, whatever its padding holds
+        alpha = np.where(
+            (lengths == 0)[:, None], self.log_starts,
+            self.log_starts + self.log_emissions.T[observations[:, 0]]
+        )
+        first = alpha
+        forward = np.zeros((batch, segments, n))
+        for j in range(segments):
+            forward[:, j] = alpha
+            alpha = log_matmul(alpha[:, None, :], transfers[:, j])[:, 0]
+        log_likelihoods = logsumexp(alpha, axis=1)
+
+        # Backward messages at the end of every segment
+        beta = np.zeros((batch, n))
+        backward = np.zeros((batch, segments, n))
+        for j in reversed(range(segments)):
+            backward[:, j] = beta
+            beta = log_matmul(transfers[:, j], beta[:, :, None])[:, :, 0]
+
+        # Fill in both kinds of message within every segment at once
+        alphas = np.zeros((batch, segments, k, n))
+        alpha = forward
+        for offset in range(k):
+            alpha = log_matmul(
+                alpha[:, :, None, :],
+                self.transfer(observations, lengths, k, offset)
+            )[:, :, 0]
+            alphas[:, :, offset] = alpha
+        posteriors = np.zeros((batch, segments, k, n))
+        transitions = np.zeros((n, n))
+        beta = backward
+        normalizer = log_likelihoods[:, None, None]
+        for offset in reversed(range(k)):
+            step = self.transfer(observations, lengths, k, offset)
+            posteriors[:, :, offset] = np.exp(
+                alphas[:, :, offset] + beta - normalizer
+            )
+
+            # Expected transitions into this step, skipping padding
+            previous = alphas[:, :, offset - 1] if offset else forward
+            valid = np.arange(1, steps, k) + offset < lengths[:, None]
+            transitions += np.einsum("bjis,bj->is", np.exp(
+                previous[:, :, :, None] + step + beta[:, :, None, :] -
+                normalizer[:, :, :, None]
+            ), valid)
+            beta = log_matmul(step, beta[:, :, :, None])[:, :, :, 0]
+        start = beta[:, 0] if segments else np.zeros((batch, n))
+        posteriors = np.concatenate([
+            np.exp(first + start - log_likelihoods[:, None])[:, None],
+            posteriors.reshape(batch, -1, n)[:, :steps - 1]
+        ], axis=1)
+        return posteriors, log_likelihoods, transitions
+
+    def fit(self, sequences, iterations=ITERATIONS, tolerance=FIT_TOLERANCE,
+            pseudocount=PSEUDOCOUNT):
+        """
+        Fit the model's probabilities to `sequences` (see pad) by
+        Baum-Welch, as in fit_chunks, with every sequence in one batch.
+        """
+        batch = self.pad(sequences)
+        return self.fit_chunks(
+            lambda: [batch], iterations, tolerance, pseudocount
+        )
+
+    def fit_csv(self, filename, iterations=ITERATIONS,
+                tolerance=FIT_TOLERANCE, pseudocount=PSEUDOCOUNT,
+                chunk_rows=CHUNK_ROWS):
+        """
+        Fit the model's probabilities by Baum-Welch, as in fit_chunks, to
+        the sequences in a CSV file with "sequence" and "observation"
+        columns, one row per observation, each sequence's rows together and
+        in order.
+
+        The file is parsed once, `chunk_rows` rows at a time, into a
+        temporary binary file of observation numbers. Every iteration then
+        reads that file, memory mapped, in batches of whole sequences of
+        similar length, each padded to at most `chunk_rows` observations,
+        so memory is bounded by that and the longest sequence however large
+        the file.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "observations")
+            lengths = self.encode_csv(filename, path, chunk_rows)
+            offsets = np.concatenate([[0], np.cumsum(lengths)])
+            observations = np.memmap(
+                path, dtype=np.int32, mode="r", shape=(int(offsets[-1]),)
+            ) if offsets[-1] else np.zeros(0, dtype=np.int32)
+
+            # Group sequences shortest first, so a batch's padding to its
+            # last (longest) member stays within chunk_rows
+            order = np.argsort(lengths, kind="stable")
+            batches = []
+            start = 0
+            for stop, length in enumerate(lengths[order].tolist()):
+                if stop > start and (stop + 1 - start) * length > chunk_rows:
+                    batches.append(order[start:stop])
+                    start = stop
+            if len(order):
+                batches.append(order[start:])
+
+            def chunks():
+                for batch in batches:
+                    sizes = lengths[batch]
+                    shifts = offsets[batch] - np.cumsum(sizes) + sizes
+                    rows = np.repeat(shifts, sizes) + np.arange(sizes.sum())
+                    yield unflatten(observations[rows], sizes)
+
+            return self.fit_chunks(chunks, iterations, tolerance, pseudocount)
+
+    def encode_csv(self, filename, path, chunk_rows=CHUNK_ROWS):
+        """
+        Write the observation numbers of a CSV file of sequences (see
+        fit_csv) to the binary file at `path`, reading `chunk_rows` rows at
+        a time. Return the array of sequence lengths.
+        """
+        lengths = []
+        current = None
+        with open(filename) as f, open(path, "wb") as out:
+            reader = csv.reader(f)
+            header = next(reader)
+            sequence = header.index("sequence")
+            observation = header.index("observation")
+            while True:
+                rows = list(itertools.islice(reader, chunk_rows))
+                if not rows:
+                    break
+                np.fromiter(
+                    (self.index[row[observation]] for row in rows),
+                    dtype=np.int32, count=len(rows)
+                ).tofile(out)
+                for name, group in itertools.groupby(
+                    row[sequence] for row in rows
+                ):
+                    size = sum(1 for _ in group)
+                    if name == current:
+                        lengths[-1] += size
+                    else:
+                        lengths.append(size)
+                        current = name
+        return np.array(lengths, dtype=np.int64)
+
+    def fit_chunks(self, chunks, iterations=ITERATIONS,
+                   tolerance=FIT_TOLERANCE, pseudocount=PSEUDOCOUNT):
+        """
+        Fit the starting, transition and emission probabilities by
+        Baum-Welch. `chunks` is a function returning a fresh iterable of
+        (observations, lengths) batches (see pad) over the data each time it
+        is called. Every iteration sums the expected counts of every batch
+        plus `pseudocount`, then normalizes them into new probabilities.
+
+        Return the list of the data's log likelihood before each iteration.
+        """
+        n = len(self.states)
+        history = []
+        for _ in range(iterations):
+            starts = np.full(n, float(pseudocount))
+            transitions = np.full((n, n), float(pseudocount))
+            emissions = np.full((n, len(self.symbols)), float(pseudocount))
+            log_likelihood = 0.0
+            for observations, lengths in chunks():
+                posteriors, log_likelihoods, expected = self.smooth(
+                    observations, lengths
+                )
+                present = lengths > 0
+                starts += posteriors[present, 0].sum(axis=0)
+                transitions += expected
+                valid = np.arange(observations.shape[1]) < lengths[:, None]
+                for state in range(n):
+                    emissions[state] += np.bincount(
+                        observations[valid], posteriors[valid][:, state],
+                        minlength=len(self.symbols)
+                    )
+                log_likelihood += log_likelihoods[present].sum()
+            history.append(log_likelihood)
+
+            self.log_starts = np.log(starts / starts.sum())
+            self.log_transitions = np.log(
+                transitions / transitions.sum(axis=1, keepdims=True)
+            )
+            self.log_emissions = np.log(
+                emissions / emissions.sum(axis=1, keepdims=True)
+            )
+            if len(history) > 1 and history[-1] - history[-2] < tolerance:
+                break
+        return history
+
+
+class StreamingFilter():
+    """
+    Follow a live stream of observations of `model`, one at a time, keeping
+    the current belief about the state and finalizing estimates of earlier
+    steps once `lag` more observations have arrived.
+
+    Finalized steps are smoothed (conditioned on every observation up to
+    the latest) and labelled with a state from the most likely path. They
+    are finalized in blocks, whenever 2 * `lag` steps are waiting, so each
+    step costs O(states^2) amortized and memory stays bounded by the lag.
+
+    Beliefs are kept as probabilities renormalized at every step, which
+    cannot underflow and avoids a log-sum-exp per step; the log likelihood
+    of the stream accumulates the normalizing constants.
+    """
+
+    def __init__(self, model, lag=LAG):
+        self.model = model
+        self.lag = lag
+        self.steps = 0
+        self.log_likelihood = 0.0
+        self.alpha = None
+        self.scores = None
+        self.transitions = np.exp(model.log_transitions)
+        self.emissions = np.exp(model.log_emissions)
+
+        # Steps not yet finalized: observation numbers, filtered
+        # beliefs, and back pointers to the previous step's states
+        self.observations = []
+        self.filtered = []
+        self.pointers = []
+
+    def belief(self):
+        """
+        Return a dictionary mapping each state name to its probability
+        given every observation so far, which before the first observation
+        is the model's start distribution.
+        """
+        if self.alpha is None:
+            return dict(zip(
+                self.model.states, np.exp(self.model.log_starts).tolist()
+            ))
+        return dict(zip(self.model.states, self.alpha.tolist()))
+
+    def update(self, observation):
+        """
+        Take in the next observation. Return the list of steps finalized
+        by it (see finalize), usually empty.
+        """
+        model = self.model
+        symbol = model.index[observation]
+        emissions = model.log_emissions[:, symbol]
+        if self.alpha is None:
+            self.alpha = np.exp(model.log_starts) * self.emissions[:, symbol]
+            self.scores = model.log_starts + emissions
+            pointer = None
+        else:
+            self.alpha = (
+                (self.alpha @ self.transitions) * self.emissions[:, symbol]
+            )
+            candidates = self.scores[:, None] + model.log_transitions
+            pointer = candidates.argmax(axis=0)
+            self.scores = candidates.max(axis=0) + emissions
+
+        # Normalize so that nothing underflows however long the stream
+        total = self.alpha.sum()
+        self.log_likelihood += math.log(total)
+        self.alpha = self.alpha / total
+        self.scores = self.scores - self.scores.max()
+
+        self.observations.append(symbol)
+        self.filtered.append(self.alpha)
+        self.pointers.append(pointer)
+        self.steps += 1
+        if len(self.observations) >= 2 * self.lag:
+            return self.finalize(len(self.observations) - self.lag)
+        return []
+
+    def flush(self):
+        """
+        Finalize every step still waiting, at the end of the stream.
+        """
+        return self.finalize(len(self.observations))
+
+    def finalize(self, count):
+        """
+        Finalize the oldest `count` waiting steps. Return a list with a
+        dictionary for each: its step number, its state on the most likely
+        path, and the probability of each state given every observation.
+        """
+        model = self.model
+        waiting = len(self.observations)
+        first = self.steps - waiting
+
+        # One backward pass over the waiting steps, newest first
+        smoothed = [None] * waiting
+        beta = np.ones(len(model.states))
+        for i in reversed(range(waiting)):
+            belief = self.filtered[i] * beta
+            smoothed[i] = belief / belief.sum()
+            beta = self.transitions @ (
+                self.emissions[:, self.observations[i]] * beta
+            )
+            beta /= beta.sum()
+
+        # Trace the most likely path back from the best current state
+        path = [0] * waiting
+        state = int(self.scores.argmax())
+        for i in reversed(range(waiting)):
+            path[i] = state
+            if self.pointers[i] is not None:
+                state = int(self.pointers[i][state])
+
+        finalized = [
+            {
+                "step": first + i,
+                "state": model.states[path[i]],
+                "probabilities": dict(
+                    zip(model.states, smoothed[i].tolist())
+                )
+            }
+            for i in range(count)
+        ]
+        del self.observations[:count]
+        del self.filtered[:count]
+        del self.pointers[:count]
+        return finalized
+
+    def stream(self, observations):
+        """
+        Yield every finalized step while consuming an iterable of
+        `observations`, flushing the rest when it ends.
+        """
+        for observation in observations:
+            yield from self.update(observation)
+        yield from self.flush()
+
+    async def astream(self, observations):
+        """
+        Yield every finalized step while consuming an async iterable of
+        `observations`, flushing the rest when it ends.
+        """
+        async for observation in observations:
+            for step in self.update(observation):
+                yield step
+        for step in self.flush():
+            yield step
+
+
+def unflatten(observations, lengths):
+    """
+    Return (padded, lengths): the sequences stored one after another in
+    `observations` with the given `lengths`, as a 2D padded array.
+    """
+    padded = np.zeros((len(lengths), lengths.max(initial=0)), dtype=np.int64)
+    padded[np.arange(padded.shape[1]) < lengths[:, None]] = observations
+    return padded, lengths
+
+
+def log_matmul(a, b):
+    """
+    Return the matrix product of `a` and `b` (stacks of matrices) with
+    every entry a logarithm: sums of products become log-sum-exps of sums.
+    """
+    return logsumexp(a[..., :, :, None] + b[..., None, :, :], axis=-2)
+
+
+def max_matmul(a, b):
+    """
+    Return the matrix product of `a` and `b` with every entry a logarithm
+    and sums replaced by maxima, as used to find best paths.
+    """
+    return (a[..., :, :, None] + b[..., None, :, :]).max(axis=-2)
+
+
+def logsumexp(values, axis):
+    """
+    Return log(sum(exp(values))) along `axis`, computed without
+    overflow or underflow.
+    """
+    top = values.max(axis=axis, keepdims=True)
+    top = np.where(np.isfinite(top), top, 0)
+    with np.errstate(divide="ignore"):
+        return (np.log(np.exp(values - top).sum(axis=axis)) +
+                np.squeeze(top, axis=axis))
@@ -0,0 +1,24 @@
+import sys
+
+import numpy as np
+
+from model import model
+
+# Fit the model's probabilities to sequences of observations in a CSV file
+# with "sequence" and "observation" columns, starting from those in model.py
+if len(sys.argv) != 2:
+    sys.exit("Usage: python learn.py data.csv")
+history = model.fit_csv(sys.argv[1])
+print(f"Log likelihood: {history[0]:.4f} -> {history[-1]:.4f} "
+      f"after {len(history)} iterations")
+
+print("Transitions")
+for state, row in zip(model.states, np.exp(model.log_transitions)):
+    print(f"    {state}: " + ", ".join(
+        f"{other} {p:.4f}" for other, p in zip(model.states, row)
+    ))
+print("Emissions")
+for state, row in zip(model.states, np.exp(model.log_emissions)):
+    print(f"    {state}: " + ", ".join(
+        f"{symbol} {p:.4f}" for symbol, p in zip(model.symbols, row)
+    ))
@@ -1,30 +1,31 @@
-from pomegranate import *
+import numpy as np
+
+from hidden_markov import HiddenMarkovModel
 
 # Observation model for each state
-sun = DiscreteDistribution({
+sun = {
     "umbrella": 0.2,
     "no umbrella": 0.8
-})
+}
 
-rain = DiscreteDistribution({
+rain = {
     "umbrella": 0.9,
     "no umbrella": 0.1
-})
+}
 
 states = [sun, rain]
 
 # Transition model
-transitions = numpy.array(
+transitions = np.array(
     [[0.8, 0.2], # Tomorrow's predictions if today = sun
      [0.3, 0.7]] # Tomorrow's predictions if today = rain
 )
 
 # Starting probabilities
-starts = numpy.array([0.5, 0.5])
+starts = np.array([0.5, 0.5])
 
 # Create the model
 model = HiddenMarkovModel.from_matrix(
     transitions, states, starts,
     state_names=["sun", "rain"]
 )
-model.bake()
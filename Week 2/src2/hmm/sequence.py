@@ -16,4 +16,4 @@ observations = [
 # Predict underlying states
 predictions = model.predict(observations)
 for prediction in predictions:
-    print(model.states[prediction].name)
+    print(model.states[prediction])
@@ -0,0 +1,37 @@
+import asyncio
+
+from hidden_markov import StreamingFilter
+from model import model
+
+# Observed data, arriving one day at a time
+observations = [
+    "umbrella",
+    "umbrella",
+    "no umbrella",
+    "umbrella",
+    "umbrella",
+    "umbrella",
+    "umbrella",
+    "no umbrella",
+    "no umbrella"
+]
+
+
+async def feed():
+    for observation in observations:
+        await asyncio.sleep(0)
+        yield observation
+
+
+async def main():
+
+    # Estimate each day once two more days have been observed
+    tracker = StreamingFilter(model, lag=2)
+    async for day in tracker.astream(feed()):
+        probabilities = ", ".join(
+            f"{state}: {p:.4f}" for state, p in day["probabilities"].items()
+        )
+        print(f"Day {day['step']}: {day['state']} ({probabilities})")
+
+
+asyncio.run(main())